@@ -0,0 +1,14 @@
+"""
+Benchmarks for the claims made in the commit messages.
+Run them from the repo root, e.g. `python -m bench.db_worker`.
+Each one works on a throwaway database, see use_temp_db.
+"""
+import os
+import tempfile
+
+
+def use_temp_db(name: str = "bench.db") -> str:
+    """Point DB_FILE_PATH to a fresh temporary file, call it before importing the db modules."""
+    path = os.path.join(tempfile.mkdtemp(prefix="bench-"), name)
+    os.environ["DB_FILE_PATH"] = path
+    return path
@@ -0,0 +1,60 @@
+"""
+Event loop lag while handlers write to the database, calling the sync db
+functions directly vs awaiting them on the db worker thread.
+
+    python -m bench.db_worker
+"""
+import asyncio
+import time
+
+from bench import use_temp_db
+
+use_temp_db()
+
+import utils.messages.dumb.mbarometro_util_v2 as mbarometro_util  # noqa: E402
+from utils.db import aio  # noqa: E402
+
+INCREMENTS = 400
+HANDLERS = 20
+
+
+async def monitor(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - start - 0.001)
+
+
+async def scenario(use_worker: bool):
+    stop = asyncio.Event()
+    lags = []
+    watcher = asyncio.create_task(monitor(stop, lags))
+
+    async def handler(i):
+        for _ in range(INCREMENTS // HANDLERS):
+            if use_worker:
+                await aio.mbarometro_util.increment(f"u{i}")
+            else:
+                mbarometro_util.increment(f"u{i}")
+            await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(handler(i) for i in range(HANDLERS)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await watcher
+
+    lags.sort()
+    label = "worker" if use_worker else "sync  "
+    print(
+        f"{label}: {INCREMENTS} increments in {elapsed:.2f}s, loop lag "
+        f"p50={lags[len(lags) // 2] * 1e3:.2f}ms "
+        f"p99={lags[int(len(lags) * 0.99)] * 1e3:.2f}ms "
+        f"max={lags[-1] * 1e3:.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(scenario(use_worker=False))
+    asyncio.run(scenario(use_worker=True))
+    aio.worker.stop()
@@ -0,0 +1,118 @@
+"""
+The monthly and daily dice queries on a large table, before and after the
+month key and the indexes, with the query plan of each one.
+Builds a table with the old schema, times the old strftime queries, then
+imports dice_db, which migrates the table, and times the new ones.
+
+    python -m bench.dice_indexes [rows]
+"""
+import datetime
+import random
+import sqlite3
+import sys
+import time
+
+from bench import use_temp_db
+
+PATH = use_temp_db("dice.db")
+
+USERS = [f"user{i}_!_{i}" for i in range(300)]
+GAMES = ["🎲", "🎯", "🎰", "🏀", "🎳"]
+DAYS = 8 * 365
+USER = USERS[7]
+TODAY = datetime.date.today().isoformat()
+
+OLD_QUERIES = {
+    "monthly_wins": (
+        "SELECT COUNT(*) FROM dice WHERE user_id = ? AND strftime('%Y-%m', date) = ? AND won = 1",
+        (USER, TODAY[:7]),
+    ),
+    "all_monthly_wins": (
+        "SELECT user_id, COUNT(*) FROM dice WHERE strftime('%Y-%m', date) = ? AND won = 1 GROUP BY user_id",
+        (TODAY[:7],),
+    ),
+    "all_monthly_players": (
+        "SELECT DISTINCT user_id FROM dice WHERE strftime('%Y-%m', date) = ?",
+        (TODAY[:7],),
+    ),
+    "daily_attempts": (
+        "SELECT attempt FROM dice WHERE user_id = ? AND date = ? AND game = ?",
+        (USER, TODAY, GAMES[0]),
+    ),
+}
+# the same queries as dice_db
+NEW_QUERIES = {
+    "monthly_wins": (
+        "SELECT COUNT(*) FROM dice WHERE month = ? AND won = 1 AND user_id = ?",
+        (TODAY[:7], USER),
+    ),
+    "all_monthly_wins": (
+        "SELECT user_id, COUNT(*) FROM dice WHERE month = ? AND won = 1 GROUP BY user_id",
+        (TODAY[:7],),
+    ),
+    "all_monthly_players": (
+        "SELECT DISTINCT user_id FROM dice WHERE month = ?",
+        (TODAY[:7],),
+    ),
+    "daily_attempts": OLD_QUERIES["daily_attempts"],
+}
+
+
+def fill(conn: sqlite3.Connection, rows: int):
+    """The table as it was created before the month key, rows spread over the last 8 years."""
+    conn.execute('''
+    CREATE TABLE dice (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        date DATE NOT NULL,
+        game TEXT NOT NULL,
+        attempt TEXT NOT NULL,
+        won INTEGER NOT NULL
+    )
+    ''')
+    start = datetime.date.today() - datetime.timedelta(days=DAYS - 1)
+    random.seed(4)
+    conn.executemany(
+        "INSERT INTO dice (user_id, date, game, attempt, won) VALUES (?, ?, ?, ?, ?)",
+        (
+            (
+                random.choice(USERS),
+                (start + datetime.timedelta(days=i * DAYS // rows)).isoformat(),
+                random.choice(GAMES),
+                str(random.randint(1, 6)),
+                int(random.random() < 0.1),
+            )
+            for i in range(rows)
+        ),
+    )
+    conn.commit()
+
+
+def bench(conn: sqlite3.Connection, queries: dict, runs: int = 5):
+    for name, (query, params) in queries.items():
+        plan = "; ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params))
+        start = time.perf_counter()
+        for _ in range(runs):
+            conn.execute(query, params).fetchall()
+        elapsed = (time.perf_counter() - start) / runs
+        print(f"  {name:20s} {elapsed * 1e3:9.2f}ms | {plan}")
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    conn = sqlite3.connect(PATH)
+    fill(conn, rows)
+    print(f"before ({rows} rows, old schema):")
+    bench(conn, OLD_QUERIES)
+    conn.close()
+
+    start = time.perf_counter()
+    from utils.db import storage
+    from utils.messages.dice import dice_db
+    print(f"migration: {time.perf_counter() - start:.1f}s")
+
+    print("after:")
+    with storage.connection() as conn:
+        bench(conn, NEW_QUERIES)
+    today = datetime.date.today()
+    assert dice_db.get_all_monthly_wins(today.month, today.year)
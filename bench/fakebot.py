@@ -0,0 +1,101 @@
+"""An in-process stand-in for the Bot API, plus builders for the updates the benchmarks push."""
+import asyncio
+import datetime
+import itertools
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+from telegram import Chat, Dice, Message, Update, User
+from telegram.ext import Application, ApplicationBuilder
+from telegram.request import BaseRequest
+
+# methods answered with a sent message, the others with True
+MESSAGE_METHODS = {"sendMessage", "sendPhoto", "sendAudio", "sendAnimation", "editMessageText"}
+
+
+class FakeRequest(BaseRequest):
+    """Answer every Bot API method after `latency` seconds and record the calls."""
+
+    def __init__(self, latency: float = 0.05, retry_after: Optional[Dict[str, int]] = None):
+        self.latency = latency
+        self.calls: List[Tuple[float, str, dict]] = []  # (time, method, parameters)
+        self.retry_after = retry_after or {}  # method -> how many calls get a 429
+        self._message_ids = itertools.count(10_000)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    @property
+    def read_timeout(self):
+        return 5
+
+    def sent(self, method: str = "sendMessage") -> List[dict]:
+        return [params for _, name, params in self.calls if name == method]
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None, connect_timeout=None, pool_timeout=None):
+        endpoint = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data else {}
+        self.calls.append((time.perf_counter(), endpoint, params))
+        await asyncio.sleep(self.latency)
+
+        if self.retry_after.get(endpoint):
+            self.retry_after[endpoint] -= 1
+            return 429, json.dumps({
+                "ok": False,
+                "error_code": 429,
+                "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1},
+            }).encode()
+
+        if endpoint == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "bot", "username": "bot"}
+        elif endpoint in MESSAGE_METHODS:
+            result = {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": int(params.get("chat_id", 1)), "type": "supergroup"},
+                "text": params.get("text", ""),
+            }
+            if "message_thread_id" in params:
+                result["message_thread_id"] = int(params["message_thread_id"])
+            if endpoint == "sendPhoto":
+                result["photo"] = [{"file_id": f"photo{next(self._message_ids)}", "file_unique_id": "u", "width": 1, "height": 1}]
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+def build_app(request: FakeRequest, processor=None) -> Application:
+    """The bot's application with its handlers, talking to the fake Bot API."""
+    import handlers
+
+    builder = ApplicationBuilder().token("1:bench").request(request).get_updates_request(FakeRequest(latency=0))
+    if processor is not None:
+        builder = builder.concurrent_updates(processor)
+    application = builder.build()
+    handlers.setup_handlers(application)
+    return application
+
+
+def _user(user_id: int) -> User:
+    return User(user_id, f"u{user_id}", False, username=f"u{user_id}")
+
+
+def dice_update(update_id: int, chat_id: int, user_id: int, emoji: str = "🎲", value: int = 3, thread_id: Optional[int] = None) -> Update:
+    message = Message(update_id, datetime.datetime.now(), Chat(chat_id, "supergroup"), from_user=_user(user_id), dice=Dice(value, emoji), message_thread_id=thread_id)
+    return Update(update_id, message=message)
+
+
+def text_update(update_id: int, chat_id: int, user_id: int, text: str, thread_id: Optional[int] = None, reply_to: Optional[Message] = None) -> Update:
+    message = Message(update_id, datetime.datetime.now(), Chat(chat_id, "supergroup"), from_user=_user(user_id), text=text, message_thread_id=thread_id, reply_to_message=reply_to)
+    return Update(update_id, message=message)
+
+
+def bind(update: Update, application: Application) -> Update:
+    update.set_bot(application.bot)
+    update.message.set_bot(application.bot)
+    return update
@@ -0,0 +1,43 @@
+"""
+How long dice rolls keep the bot busy. Five users send their second roll,
+whose reply waits for the dice animation, through the sequential
+process_update, against a fake Bot API with 50ms latency.
+
+    python -m bench.game_replies
+"""
+import asyncio
+import time
+
+from bench import use_temp_db
+
+use_temp_db()
+
+from bench.fakebot import FakeRequest, bind, build_app, dice_update  # noqa: E402
+
+CHAT_ID = -4594212673
+ROLLERS = 5
+
+
+async def main():
+    request = FakeRequest(latency=0.05)
+    application = build_app(request)
+    async with application:
+        await application.start()
+        for i in range(ROLLERS):  # the first roll of each user is answered right away
+            await application.process_update(bind(dice_update(1000 + i, CHAT_ID, 100 + i, value=3), application))
+        request.calls.clear()
+
+        start = time.perf_counter()
+        for i in range(ROLLERS):
+            await application.process_update(bind(dice_update(i + 1, CHAT_ID, 100 + i, value=4), application))
+        handled = time.perf_counter() - start
+        while len(request.sent()) < ROLLERS:
+            await asyncio.sleep(0.01)
+        replied = time.perf_counter() - start
+        await application.stop()
+
+    print(f"{ROLLERS} rollers: all updates handled after {handled:.2f}s, all replies sent after {replied:.2f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+"""
+Latency of moving a todo to the completed topic, against a fake Bot API
+with 50ms per call. The old flow ran every step in sequence: status
+update, send, save the new message id, delete the old message. The new
+one records the move in the outbox with the status update and deletes
+the old message while the new message id is saved.
+Also times 20 todos completed together, one after the other with the old
+flow and through move_todos.
+
+    python -m bench.todo_move
+"""
+import asyncio
+import dataclasses
+import datetime
+import logging
+import statistics
+import time
+
+from bench import use_temp_db
+
+use_temp_db("todos.db")
+
+from telegram import Chat, Message  # noqa: E402
+
+from bench.fakebot import FakeRequest, bind, build_app, text_update  # noqa: E402
+from messages.todo_v2 import _move_todo, chat, completed_chat, move_todos  # noqa: E402
+from utils.db.aio import todo_db  # noqa: E402
+from utils.escape import escape_protected_chars  # noqa: E402
+from utils.messages.todo.todo_db import TodoItem, TodoMove  # noqa: E402
+
+MOVES = 20
+logging.disable(logging.CRITICAL)
+
+
+async def new_todos(count: int):
+    """Todos shown in the active chat, with their message ids."""
+    todos = []
+    for i in range(count):
+        todo = await todo_db.add_todo_item(TodoItem(text=f"todo {i}", user_id="1"))
+        message_id = 50_000 + todo.id
+        await todo_db.set_todo_item_message_id(todo.id, message_id)
+        todos.append((todo.id, message_id))
+    return todos
+
+
+async def old_move(bot, todo_id: int, message_id: int):
+    """Every step in sequence, as before the outbox."""
+    todo = await todo_db.set_todo_item_status(todo_id, TodoItem.Status.DONE)
+    new_message = await bot.send_message(
+        chat_id=completed_chat.id,
+        message_thread_id=completed_chat.thread_id,
+        text=escape_protected_chars(f"{todo}"),
+        parse_mode="MarkdownV2",
+    )
+    await todo_db.set_todo_item_message_id(todo_id, new_message.message_id)
+    await bot.delete_message(chat_id=chat.id, message_id=message_id)
+
+
+def move_of(todo_id: int, message_id: int) -> TodoMove:
+    return TodoMove(todo_id, chat.id, message_id, completed_chat.id, completed_chat.thread_id)
+
+
+async def new_move(application, todo_id: int, message_id: int):
+    """What the status handler does on a move."""
+    move = move_of(todo_id, message_id)
+    todo = await todo_db.set_todo_item_status(todo_id, TodoItem.Status.DONE, move)
+    await _move_todo(application, move, escape_protected_chars(f"{todo}"))
+
+
+async def timed(label: str, moves):
+    times = []
+    for move in moves:
+        start = time.perf_counter()
+        await move
+        times.append(time.perf_counter() - start)
+    print(f"{label}: p50 {statistics.median(times) * 1e3:.0f}ms, max {max(times) * 1e3:.0f}ms over {len(times)} moves")
+
+
+async def main():
+    request = FakeRequest(latency=0.05)
+    application = build_app(request)
+    async with application:
+        await application.start()
+        bot = application.bot
+
+        await timed("old flow        ", (old_move(bot, *todo) for todo in await new_todos(MOVES)))
+        await timed("new flow        ", (new_move(application, *todo) for todo in await new_todos(MOVES)))
+
+        # the whole status handler, from the reply to the command message
+        handled = []
+        for i, (todo_id, message_id) in enumerate(await new_todos(MOVES)):
+            original = Message(message_id, datetime.datetime.now(), Chat(chat.id, "supergroup"), text="Todo: x", message_thread_id=chat.thread_id)
+            update = bind(text_update(100 + i, chat.id, 100, "status done", thread_id=chat.thread_id, reply_to=original), application)
+            handled.append(application.process_update(update))
+        await timed("status handler  ", handled)
+
+        todos = await new_todos(MOVES)
+        start = time.perf_counter()
+        for todo in todos:
+            await old_move(bot, *todo)
+        print(f"{MOVES} todos, old flow one by one: {time.perf_counter() - start:.2f}s")
+
+        todos = await new_todos(MOVES)
+        start = time.perf_counter()
+        template = move_of(0, 0)
+        changed = await todo_db.set_todo_items_status([todo_id for todo_id, _ in todos], TodoItem.Status.DONE, template)
+        await move_todos(application, [
+            (dataclasses.replace(template, todo_id=todo.id, source_message_id=todo.message_id), escape_protected_chars(f"{todo}"))
+            for todo in changed
+        ])
+        print(f"{MOVES} todos, move_todos:            {time.perf_counter() - start:.2f}s")
+
+        await asyncio.sleep(0.1)  # the outbox rows are removed in the background
+        pending = await todo_db.get_pending_todo_moves()
+        await application.stop()
+    print(f"moves left in the outbox: {len(pending)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
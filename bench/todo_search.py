@@ -0,0 +1,82 @@
+"""
+/findtodo search on 100k synthetic todos: FTS5 pages vs a LIKE scan, and
+what the sync triggers add to a bulk insert. Also checks that walking
+the keyset pages gives the full ranking back.
+
+    python -m bench.todo_search
+"""
+import random
+import time
+
+from bench import use_temp_db
+
+use_temp_db("todos.db")
+
+from utils.db import storage  # noqa: E402
+from utils.messages.todo import todo_db  # noqa: E402
+
+TODOS = 100_000
+WORDS = (
+    "server deploy bug fix cliente fattura telegram bot database migrazione backup report ticket "
+    "pagamento rete firewall email account password login errore crash aggiornamento ordine "
+    "spedizione magazzino prezzo offerta contratto riunione"
+).split()
+RARE = ["kubernetes", "ferragosto", "zanzara"]
+
+
+def todo_text(i: int) -> str:
+    text = " ".join(random.choice(WORDS) for _ in range(random.randint(5, 25)))
+    if i % 1000 == 0:
+        text += f" {RARE[i % 3]}"
+    return text
+
+
+def bench(label: str, fn, runs: int = 20):
+    fn()
+    start = time.perf_counter()
+    for _ in range(runs):
+        result = fn()
+    print(f"{label}: {(time.perf_counter() - start) / runs * 1e3:.2f}ms, {len(result)} results")
+    return result
+
+
+def like_page(text: str):
+    words = text.split()
+    where = " AND ".join(["todo_text LIKE ?"] * len(words))
+    with storage.connection() as conn:
+        return conn.execute(
+            f"SELECT id, todo_text FROM {todo_db.TABLE_NAME} WHERE {where} ORDER BY id LIMIT 10",
+            [f"%{word}%" for word in words],
+        ).fetchall()
+
+
+def insert(table: str, rows) -> float:
+    start = time.perf_counter()
+    with storage.connection() as conn:
+        conn.executemany(f"INSERT INTO {table} (user_id, todo_text) VALUES (?, ?)", rows)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    random.seed(7)
+    rows = [(str(i % 20), todo_text(i)) for i in range(TODOS)]
+    with storage.connection() as conn:
+        conn.execute(f"CREATE TABLE plain AS SELECT * FROM {todo_db.TABLE_NAME} WHERE 0")
+    print(f"insert {TODOS} todos with the fts triggers: {insert(todo_db.TABLE_NAME, rows):.2f}s")
+    print(f"insert {TODOS} todos without:              {insert('plain', rows):.2f}s")
+
+    for text in ["kubernetes", "ferr", "fattura cliente"]:
+        bench(f"LIKE '{text}' first page", lambda: like_page(text))
+        results = bench(f"FTS5 '{text}' first page", lambda: todo_db.search_todo_items(text))
+        item, _, rank = results[-1]
+        bench(f"FTS5 '{text}' next page ", lambda: todo_db.search_todo_items(text, after=(rank, item.id)))
+
+    ranking = [item.id for item, _, _ in todo_db.search_todo_items("kubernetes", limit=1000)]
+    walked, after = [], None
+    while True:
+        page = todo_db.search_todo_items("kubernetes", after=after, limit=7)
+        walked += [item.id for item, _, _ in page]
+        if len(page) < 7:
+            break
+        after = (page[-1][2], page[-1][0].id)
+    print(f"keyset pages match the full ranking: {walked == ranking} ({len(walked)} results)")
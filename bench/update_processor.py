@@ -0,0 +1,80 @@
+"""
+Throughput of the bot with sequential update processing vs the
+KeyedUpdateProcessor, against a fake Bot API with 50ms latency, and how
+long a busy chat can hold up another chat.
+
+    python -m bench.update_processor
+"""
+import asyncio
+import datetime
+import logging
+import time
+
+from bench import use_temp_db
+
+use_temp_db()
+
+from telegram import Chat, Message, Update, User  # noqa: E402
+
+from bench.fakebot import FakeRequest, build_app, text_update  # noqa: E402
+from utils.telegram.update_processor import KeyedUpdateProcessor  # noqa: E402
+
+# the trigger handlers log every reply they can't send with media
+logging.disable(logging.CRITICAL)
+
+
+async def throughput(label: str, updates, processor=None):
+    request = FakeRequest(latency=0.05)
+    application = build_app(request, processor)
+    async with application:
+        await application.start()
+        start = time.perf_counter()
+        for update in updates:
+            update.set_bot(application.bot)
+            update.message.set_bot(application.bot)
+            await application.update_queue.put(update)
+        while len(request.sent()) < len(updates):
+            await asyncio.sleep(0.005)
+        elapsed = time.perf_counter() - start
+        await application.stop()
+    print(f"{label}: {len(updates)} updates in {elapsed:.2f}s ({len(updates) / elapsed:.0f} updates/s)")
+
+
+async def other_chat_wait(bound: int = 4, queued: int = 10):
+    """Time an update in a quiet chat takes to start while another chat has `queued` updates waiting."""
+    processor = KeyedUpdateProcessor(bound)
+    running = peak = 0
+
+    def update(update_id: int, chat_id: int) -> Update:
+        message = Message(update_id, datetime.datetime.now(), Chat(chat_id, "group"), from_user=User(update_id, "u", False), text="x")
+        return Update(update_id, message=message)
+
+    async def work(delay: float):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(delay)
+        running -= 1
+
+    busy = [asyncio.create_task(processor.process_update(update(i, -1), work(0.05))) for i in range(queued)]
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await processor.process_update(update(queued, -2), work(0))
+    waited = time.perf_counter() - start
+    await asyncio.gather(*busy)
+
+    spread = [processor.process_update(update(100 + i, -100 - i), work(0.01)) for i in range(20)]
+    peak = 0
+    await asyncio.gather(*spread)
+    print(f"bound {bound}, {queued} updates queued in one chat: another chat waited {waited:.3f}s, 20 chats peaked at {peak} running")
+
+
+async def main():
+    await throughput("sequential, 100 chats", [text_update(i + 1, -1000 - i, 100 + i, "minchia") for i in range(100)])
+    await throughput("keyed,      100 chats", [text_update(i + 1, -1000 - i, 100 + i, "minchia") for i in range(100)], KeyedUpdateProcessor(64))
+    await throughput("keyed,      same chat", [text_update(i + 1, -1000, 100 + i % 3, f"minchia {i}") for i in range(20)], KeyedUpdateProcessor(64))
+    await other_chat_wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -6,7 +6,15 @@ import logging
 import os
 
 from utils.logging.logSetup import logSetup
+from utils.db import aio
+from utils.telegram.update_processor import KeyedUpdateProcessor
+from utils.telegram.rate_limiter import PriorityRateLimiter
+from utils.telegram.delete_queue import delete_queue
+from utils.telegram.edit_scheduler import edit_scheduler
+from utils.messages.dumb.unsplash import unsplash
+from var.messages.dumb import UNSPLASH_QUERIES, check_local_images
 from commands import Commands  # Import the Commands enum
+from messages.todo_v2 import resume_todo_moves
 # from var.commands.Commands import Commands
 
 logger = logging.getLogger(__name__)
@@ -17,6 +25,26 @@ async def post_init(application: Application) -> None:
     commands = [command.bot_command for command in Commands]
     # Now set the commands using the externalized list
     await application.bot.set_my_commands(commands)
+    # build the in-memory monthly leaderboard before the first /getwins
+    await aio.dice_util.rebuild_monthly_leaderboard()
+    # prefetch the unsplash images in the background, triggers never wait on the api
+    await unsplash.start(UNSPLASH_QUERIES)
+    check_local_images()
+    # finish the todo moves interrupted by the last shutdown
+    await resume_todo_moves(application)
+
+async def post_stop(application: Application) -> None:
+    # send the edits and deletions still queued while the bot can still send requests
+    await edit_scheduler.close()
+    await delete_queue.close()
+    # flush the pending db writes once the updates stopped coming in
+    await aio.worker.drain()
+    logger.info(f"Outgoing requests: {application.bot.rate_limiter.metrics()}")
+
+async def post_shutdown(application: Application) -> None:
+    await unsplash.close()
+    # let the queued db calls finish before the process exits
+    aio.worker.stop()
 
 if __name__ == '__main__':
     load_dotenv()
@@ -25,7 +53,18 @@ if __name__ == '__main__':
     # log the mode
     logger.info(f"Mode: {mode}")
     token = os.getenv('TOKEN') if mode == 'PROD' else os.getenv('TOKEN_DEV')
-    application = ApplicationBuilder().token(token).post_init(post_init).build()
+    application = (
+        ApplicationBuilder()
+        .token(token)
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .post_shutdown(post_shutdown)
+        # parallel across chats, in order within the same chat or user
+        .concurrent_updates(KeyedUpdateProcessor(int(os.getenv('MAX_CONCURRENT_UPDATES', '64'))))
+        # flood limits and send priorities, see utils/telegram/rate_limiter.py
+        .rate_limiter(PriorityRateLimiter())
+        .build()
+    )
 
     setup_handlers(application)  # Call the function to setup handlers
     
@@ -3,6 +3,7 @@ from .start import start
 from .getChatInfo import getChatInfo
 from .lavagnetta import addLavagnetta, lavagnetta, removeLavagnetta
 from .dice import show_games_keyboard, get_all_monthly_wins
+from .todos import todos, findtodo, done, priority
 
 # from __future__ import annotations
 from dataclasses import dataclass
@@ -25,6 +26,10 @@ class CommandDef:
 class Commands(Enum):
     START          = CommandDef("start",        "health-check",                    start)
     TODOINFO       = CommandDef("todoinfo",     "instructions for updating todos", None)
+    TODOS          = CommandDef("todos",        "list todos: [active|done] [priority] [network]", todos)
+    FINDTODO       = CommandDef("findtodo",     "search the todos by text",        findtodo)
+    DONE           = CommandDef("done",         "complete todos: 12 15 18-25",     done)
+    PRIORITY       = CommandDef("priority",     "set todos priority: high 12 15-18", priority)
     ADDLAVAGNETTA  = CommandDef("addlavagnetta","add a new lavagnetta item",       addLavagnetta)
     LISTLAVAGNETTA = CommandDef("lavagnetta",   "list all lavagnetta items",       lavagnetta)
     REMOVELAVAGNETTA = CommandDef("removelavagnetta", "remove a lavagnetta item",  removeLavagnetta)
@@ -1,6 +1,5 @@
 import logging
 import datetime
-from telegram.helpers import escape_markdown
 from telegram.constants import ParseMode
 from telegram import Update, ReplyKeyboardMarkup 
 from telegram.ext import ContextTypes
@@ -8,10 +7,8 @@ from utils.auth.auth import chat_restricted, Chat
 from var.messages.dice.showGames import message as games_keyboard_message
 from utils.auth.auth import chat_restricted
 
-from utils.messages.dice.dice_util_v2 import (
-    get_monthly_players,
-    check_all_monthly_wins
-)
+from utils.db.aio import dice_util
+from utils.markdown import MessageBuilder, escape
 
 log = logging.getLogger(__name__)
 
@@ -41,21 +38,21 @@ async def get_all_monthly_wins(update: Update, context: ContextTypes.DEFAULT_TYP
     # mm/yy format
     now = datetime.datetime.now()
     # message = "*Vincite mensili:*\n\n"
-    message = f"*Vincite {now.month}/{now.year}*:\n"
-    message += f"_aggiornate al {now.day}/{now.month}/{now.year}_\n\n"
+    message = MessageBuilder()
+    message.add(f"*Vincite {now.month}/{now.year}*:\n")
+    message.add(f"_aggiornate al {now.day}/{now.month}/{now.year}_\n\n")
 
+    ranking = await dice_util.get_monthly_ranking()
     max = 0
     max_user = None
-    for user, wins in sorted(
-        check_all_monthly_wins().items(), key=lambda x: x[1], reverse=True
-    ):
+    for user, wins in ranking:
         log.debug(f"User: {user}, Wins: {wins}")
         # username = user.split("_!_")[0]
         # userid = user.split("_!_")[1]
         username, userid = user.split("_!_")
         identifier = username if username != "None" else userid
 
-        message += escape_markdown(f"{wins}: {identifier}\n")
+        message.text(f"{wins}: {identifier}\n")
 
         if wins > max:
             max = wins
@@ -65,34 +62,32 @@ async def get_all_monthly_wins(update: Update, context: ContextTypes.DEFAULT_TYP
         # check for ties
         tied_users = [
             identifier
-            for identifier, wins in check_all_monthly_wins().items()
+            for identifier, wins in ranking
             if wins == max
         ]
         if len(tied_users) > 1:
-            message += f"\nCi sono {len(tied_users)} utenti con {max} vincite:\n"
+            message.add(f"\nCi sono {len(tied_users)} utenti con {max} vincite:\n")
             for tied_user in tied_users:
                 tied_username, tied_userid = tied_user.split("_!_")
                 tied_identifier = (
                     tied_username if tied_username != "None" else tied_userid
                 )
-                message += escape_markdown(f"{tied_identifier}\n")
+                message.text(f"{tied_identifier}\n")
         else:
-            message += f"\nIl più vincente è *{escape_markdown(max_user)}* con {max} vincite\\!\n"
+            message.add(f"\nIl più vincente è *{escape(max_user)}* con {max} vincite\\!\n")
 
-    monthly_players = get_monthly_players()
+    monthly_players = await dice_util.get_monthly_players()
 
-    monthly_players_string = f"\n**>GIOCATORI MENSILI:\n>\n"
+    # a single part, so the quote is only split if it doesn't fit in a message by itself
+    players = [f"\n**>GIOCATORI MENSILI:\n>"]
     for user in monthly_players:
         username, userid = user.split("_!_")
         identifier = username if username != "None" else userid
-        monthly_players_string += ">\\- " + escape_markdown(f"{identifier}\n")
-
-    monthly_players_string = monthly_players_string.rstrip("\n") + "||"
-    message += monthly_players_string
-
-    log.debug(f"Message: {message}")
-    await update.effective_message.reply_text(
-        text=message, parse_mode=ParseMode.MARKDOWN_V2
-    )
-
+        players.append(">\\- " + escape(identifier))
+    message.add("\n".join(players) + "||")
 
+    for chunk in message.split():
+        log.debug(f"Message: {chunk}")
+        await update.effective_message.reply_text(
+            text=chunk, parse_mode=ParseMode.MARKDOWN_V2
+        )
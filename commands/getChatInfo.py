@@ -1,7 +1,42 @@
 from telegram import Update
 from telegram.ext import ContextTypes
 from utils.auth.auth import protected_handler
-import textwrap
+from utils.markdown import Template
+
+CHAT_INFO_TEMPLATE = Template("""
+    *Chat ID:*
+    `{chat_id}`
+
+    *Thread ID:*
+    `{thread_id}`
+
+    *Chat Title:*
+    `{title}`
+
+    *Chat Type:*
+    `{type}`
+
+    *Chat Username:*
+    `{username}`
+
+    *Chat First Name:*
+    `{first_name}`
+
+    *Chat Last Name:*
+    `{last_name}`
+
+    *Message User ID:*
+    `{user_id}`
+
+    *Message User First Name:*
+    `{user_first_name}`
+
+    *Message User Last Name:*
+    `{user_last_name}`
+
+    *Message User Username:*
+    `{user_username}`
+    """)
 
 @protected_handler(notify=False)
 async def getChatInfo(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -9,39 +44,17 @@ async def getChatInfo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat = update.effective_chat
     message = update.effective_message
 
-    chat_info = textwrap.dedent(f"""
-        *Chat ID:*
-        `{chat.id}`
-        
-        *Thread ID:*
-        `{message.message_thread_id}`
-        
-        *Chat Title:*
-        `{chat.title}`
-        
-        *Chat Type:*
-        `{chat.type}`
-        
-        *Chat Username:*
-        `{chat.username}`
-        
-        *Chat First Name:*
-        `{chat.first_name}`
-        
-        *Chat Last Name:*
-        `{chat.last_name}`
-        
-        *Message User ID:*
-        `{message.from_user.id}`
-        
-        *Message User First Name:*
-        `{message.from_user.first_name}`
-        
-        *Message User Last Name:*
-        `{message.from_user.last_name}`
-        
-        *Message User Username:*
-        `{message.from_user.username}`
-        
-        """).strip()
+    chat_info = CHAT_INFO_TEMPLATE.render(
+        chat_id=chat.id,
+        thread_id=message.message_thread_id,
+        title=chat.title,
+        type=chat.type,
+        username=chat.username,
+        first_name=chat.first_name,
+        last_name=chat.last_name,
+        user_id=message.from_user.id,
+        user_first_name=message.from_user.first_name,
+        user_last_name=message.from_user.last_name,
+        user_username=message.from_user.username,
+    ).strip()
     await update.effective_message.reply_text(chat_info, do_quote=False, parse_mode="MarkdownV2")
\ No newline at end of file
@@ -1,6 +1,6 @@
 from telegram import Update
 from telegram.ext import ContextTypes
-import utils.commands.list_util_v2 as list_util
+from utils.db.aio import list_util
 
 # Function to add a new lavagnetta item
 async def addLavagnetta(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -9,13 +9,13 @@ async def addLavagnetta(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Please specify a lavagnetta item.")
         return
 
-    list_util.add_item(item_item, "lav")  # Use the utility function
+    await list_util.add_item(item_item, "lav")  # Use the utility function
 
     await update.message.reply_text(f"Added item: {item_item}")
 
 # Function to list all items with indexes
 async def lavagnetta(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    items = list_util.get_all_items("lav")  # Use the utility function
+    items = await list_util.get_all_items("lav")  # Use the utility function
 
     if not items:
         await update.message.reply_text("No items.")
@@ -33,7 +33,7 @@ async def removeLavagnetta(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Please provide a valid item index to remove.")
         return
 
-    removed_item = list_util.remove_item_by_index(index, "lav")  # Use the utility function
+    removed_item = await list_util.remove_item_by_index(index, "lav")  # Use the utility function
 
     if removed_item:
         await update.message.reply_text(f"Removed item: {removed_item}")
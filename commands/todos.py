@@ -0,0 +1,280 @@
+import dataclasses
+import logging
+from typing import List, Optional, Tuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.constants import ParseMode
+from telegram.ext import ContextTypes
+
+from messages.todo_v2 import chat, completed_chat, move_todos
+from utils.auth.auth import chat_restricted
+from utils.db.aio import todo_db
+from utils.escape import escape_protected_chars
+from utils.markdown import MessageBuilder, escape
+from utils.messages.todo.todo_db import PRIORITY_EMOJI, SNIPPET_END, SNIPPET_START, STATUS_EMOJI, TodoItem, TodoMove
+from utils.telegram.edit_scheduler import edit_scheduler
+from utils.telegram.rate_limiter import SendPriority, send_priority
+
+log = logging.getLogger("todo")
+
+PAGE_SIZE = 10
+CALLBACK_PREFIX = "todos"
+FIND_CALLBACK_PREFIX = "findtodo"
+# chat_data key of the searches by result message id, the text doesn't fit in callback_data
+FIND_SEARCHES = "findtodo_searches"
+MAX_SEARCHES = 20
+# telegram limit for callback_data
+MAX_CALLBACK_DATA = 64
+# ids a bulk command can change at once
+MAX_BULK_IDS = 200
+
+Filters = Tuple[str, Optional[str], Optional[str]]  # status, priority, network
+
+
+def _parse_filters(args: List[str]) -> Filters:
+    """/todos [active|done] [low|normal|high] [network], in any order."""
+    status, priority, network = TodoItem.Status.ACTIVE, None, None
+    for arg in args:
+        value = arg.lower()
+        if value in TodoItem.Status._value2member_map_:
+            status = TodoItem.Status(value)
+        elif value in TodoItem.Priority._value2member_map_:
+            priority = TodoItem.Priority(value)
+        else:
+            network = value
+    return status, priority, network
+
+
+def _callback_data(filters: Filters, page: int, after_id: Optional[int]) -> str:
+    status, priority, network = filters
+    # the network last, it is the only value that may contain ":"
+    return f"{CALLBACK_PREFIX}:{page}:{after_id or ''}:{status}:{priority or ''}:{network or ''}"
+
+
+def _parse_callback_data(data: str) -> Tuple[Filters, int, Optional[int]]:
+    _, page, after_id, status, priority, network = data.split(":", 5)
+    filters = (status, priority or None, network or None)
+    return filters, int(page), int(after_id) if after_id else None
+
+
+async def _render_page(filters: Filters, page: int, after_id: Optional[int]) -> Tuple[str, InlineKeyboardMarkup]:
+    status, priority, network = filters
+    # one more than a page, to know if there is a next one
+    items = await todo_db.get_todo_page(status, priority, network, after_id, limit=PAGE_SIZE + 1)
+    has_next = len(items) > PAGE_SIZE
+    items = items[:PAGE_SIZE]
+
+    message = MessageBuilder()
+    message.add(f"*Todo {escape(status)}* \\- pagina {page}\n")
+    if priority or network:
+        message.text(f"filtri: {' '.join(value for value in (priority, network) if value)}\n")
+    message.add("\n")
+    if not items:
+        message.text("Nessun todo")
+    for item in items:
+        title = item.text.strip().split("\n", 1)[0]
+        if len(title) > 60:
+            title = title[:59] + "…"
+        message.add(f"{PRIORITY_EMOJI.get(item.priority, '')} `#{item.id}` ")
+        message.text(title)
+        if item.network:
+            message.add(f" _{escape(item.network)}_")
+        message.add("\n")
+
+    buttons = []
+    if page > 1:
+        buttons.append(InlineKeyboardButton("⏮ inizio", callback_data=_callback_data(filters, 1, None)))
+    if has_next:
+        buttons.append(
+            InlineKeyboardButton("avanti ▶️", callback_data=_callback_data(filters, page + 1, items[-1].id))
+        )
+    return message.build(), InlineKeyboardMarkup([buttons] if buttons else [])
+
+
+@chat_restricted([chat, completed_chat], notify=False)
+async def todos(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """List the todos, one page at a time."""
+    filters = _parse_filters(context.args or [])
+    if len(_callback_data(filters, 9999, 2**31).encode()) > MAX_CALLBACK_DATA:
+        await update.effective_message.reply_text("Nome del network troppo lungo", do_quote=False)
+        return
+    text, reply_markup = await _render_page(filters, 1, None)
+    await update.effective_message.reply_text(
+        text,
+        parse_mode=ParseMode.MARKDOWN_V2,
+        reply_markup=reply_markup,
+        do_quote=False,
+    )
+
+
+@chat_restricted([chat, completed_chat], notify=False)
+async def todos_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show the page of a /todos button, only that page is read from the db."""
+    query = update.callback_query
+    await query.answer()
+    filters, page, after_id = _parse_callback_data(query.data)
+    text, reply_markup = await _render_page(filters, page, after_id)
+    await query.edit_message_text(
+        text,
+        parse_mode=ParseMode.MARKDOWN_V2,
+        reply_markup=reply_markup,
+    )
+
+
+async def _render_search(text: str, page: int, after: Optional[Tuple[float, int]]) -> Tuple[str, InlineKeyboardMarkup]:
+    results = await todo_db.search_todo_items(text, after, limit=PAGE_SIZE + 1)
+    has_next = len(results) > PAGE_SIZE
+    results = results[:PAGE_SIZE]
+
+    message = MessageBuilder()
+    message.add(f"*Ricerca:* {escape(text)} \\- pagina {page}\n\n")
+    if not results:
+        message.text("Nessun todo trovato")
+    for item, snippet, _ in results:
+        message.add(f"{STATUS_EMOJI.get(item.status, '')}{PRIORITY_EMOJI.get(item.priority, '')} `#{item.id}` ")
+        # the matched words in bold
+        message.add(escape(" ".join(snippet.split())).replace(SNIPPET_START, "*").replace(SNIPPET_END, "*"))
+        message.add("\n")
+
+    buttons = []
+    if page > 1:
+        buttons.append(InlineKeyboardButton("⏮ inizio", callback_data=f"{FIND_CALLBACK_PREFIX}:1::"))
+    if has_next:
+        item, _, score = results[-1]
+        buttons.append(
+            InlineKeyboardButton("avanti ▶️", callback_data=f"{FIND_CALLBACK_PREFIX}:{page + 1}:{score!r}:{item.id}")
+        )
+    return message.build(), InlineKeyboardMarkup([buttons] if buttons else [])
+
+
+@chat_restricted([chat, completed_chat], notify=False)
+async def findtodo(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Full-text search of the todos, best matches first."""
+    text = " ".join(context.args or [])
+    if not text:
+        await update.effective_message.reply_text("Uso: /findtodo testo da cercare", do_quote=False)
+        return
+    rendered, reply_markup = await _render_search(text, 1, None)
+    message = await update.effective_message.reply_text(
+        rendered,
+        parse_mode=ParseMode.MARKDOWN_V2,
+        reply_markup=reply_markup,
+        do_quote=False,
+    )
+    searches = context.chat_data.setdefault(FIND_SEARCHES, {})
+    searches[message.message_id] = text
+    while len(searches) > MAX_SEARCHES:
+        searches.pop(next(iter(searches)))
+
+
+@chat_restricted([chat, completed_chat], notify=False)
+async def findtodo_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show the page of a /findtodo button."""
+    query = update.callback_query
+    text = context.chat_data.get(FIND_SEARCHES, {}).get(query.message.message_id)
+    if text is None:
+        await query.answer("Ricerca scaduta, ripeti /findtodo")
+        return
+    await query.answer()
+    _, page, score, todo_id = query.data.split(":")
+    after = (float(score), int(todo_id)) if score else None
+    rendered, reply_markup = await _render_search(text, int(page), after)
+    await query.edit_message_text(
+        rendered,
+        parse_mode=ParseMode.MARKDOWN_V2,
+        reply_markup=reply_markup,
+    )
+
+
+def _parse_ids(args: List[str]) -> Optional[List[int]]:
+    """Ids and ranges like `12 15 18-25` (or `#12, 15`) as sorted ids, None if malformed."""
+    ids = set()
+    for arg in " ".join(args).replace(",", " ").split():
+        start, _, end = arg.lstrip("#").partition("-")
+        if not start.isdigit() or (end and not end.isdigit()):
+            return None
+        start, end = sorted((int(start), int(end or start)))
+        if len(ids) + end - start + 1 > MAX_BULK_IDS:
+            return None
+        ids.update(range(start, end + 1))
+    return sorted(ids) or None
+
+
+def _bulk_summary(action: str, ids: List[int], changed: List[TodoItem]) -> str:
+    message = MessageBuilder().text(f"{action}: {len(changed)} todo")
+    unchanged = sorted(set(ids) - {item.id for item in changed})
+    if unchanged:
+        message.text(f"\ninvariati o non trovati: {' '.join(f'#{todo_id}' for todo_id in unchanged)}")
+    return message.build()
+
+
+@send_priority(SendPriority.HIGH)
+@chat_restricted([chat, completed_chat], notify=False)
+async def done(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/done 12 15 18-25: complete many todos at once and move them to the completed chat."""
+    ids = _parse_ids(context.args or [])
+    if ids is None:
+        await update.effective_message.reply_text(
+            escape(f"Uso: /done 12 15 18-25 (al massimo {MAX_BULK_IDS} todo)"),
+            parse_mode=ParseMode.MARKDOWN_V2,
+            do_quote=False,
+        )
+        return
+    # todo_id and source_message_id are filled per todo, the outbox rows
+    # are written together with the status, see set_todo_items_status
+    move = TodoMove(
+        todo_id=0,
+        source_chat_id=chat.id,
+        source_message_id=0,
+        target_chat_id=completed_chat.id,
+        target_thread_id=completed_chat.thread_id,
+    )
+    changed = await todo_db.set_todo_items_status(ids, TodoItem.Status.DONE, move)
+    await update.effective_message.reply_text(
+        _bulk_summary("Completati", ids, changed),
+        parse_mode=ParseMode.MARKDOWN_V2,
+        do_quote=False,
+    )
+    moves = [
+        (dataclasses.replace(move, todo_id=item.id, source_message_id=item.message_id),
+         escape_protected_chars(f"{item}"))
+        for item in changed
+        if item.message_id is not None
+    ]
+    # sent in the background, the rate limiter may take a while
+    context.application.create_task(move_todos(context.application, moves))
+
+
+@send_priority(SendPriority.HIGH)
+@chat_restricted([chat, completed_chat], notify=False)
+async def priority(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/priority high 12 15-18: set the priority of many todos at once."""
+    args = context.args or []
+    value = args[0].lower() if args else None
+    ids = _parse_ids(args[1:])
+    if value not in TodoItem.Priority._value2member_map_ or ids is None:
+        priorities = "|".join(TodoItem.Priority)
+        await update.effective_message.reply_text(
+            escape(f"Uso: /priority {priorities} 12 15 18-25 (al massimo {MAX_BULK_IDS} todo)"),
+            parse_mode=ParseMode.MARKDOWN_V2,
+            do_quote=False,
+        )
+        return
+    changed = await todo_db.set_todo_items_priority(ids, TodoItem.Priority(value))
+    await update.effective_message.reply_text(
+        _bulk_summary(f"Priorità {value}", ids, changed),
+        parse_mode=ParseMode.MARKDOWN_V2,
+        do_quote=False,
+    )
+    for item in changed:
+        if item.message_id is None:
+            continue
+        # the edits go out through the rate limiter, coalesced with any reply to the same todo
+        todo_chat = completed_chat if item.status == TodoItem.Status.DONE else chat
+        edit_scheduler.schedule(
+            context.bot,
+            todo_chat.id,
+            item.message_id,
+            escape_protected_chars(f"{item}"),
+            parse_mode=ParseMode.MARKDOWN_V2,
+        )
@@ -6,6 +6,7 @@ import os
 # Third-party imports
 from telegram import BotCommand
 from telegram.ext import (
+    CallbackQueryHandler,
     CommandHandler,
     MessageHandler,
     filters,
@@ -15,11 +16,17 @@ from telegram.ext import (
 # Local imports
 from messages.dice import slot, dice, bullseye, soccer, basket, bowling, spattemu
 from messages.dumb import (
-    handler_mapping,
+    filter_dumb_triggers,
     handle_dumb_message,
 )
 from messages.addme import addme
 from messages.todo_v2 import addTodo, updateTodo, todoInfo, chat, deleteUnwantedMessage
+from commands.todos import (
+    CALLBACK_PREFIX as TODOS_CALLBACK_PREFIX,
+    FIND_CALLBACK_PREFIX,
+    findtodo_page,
+    todos_page,
+)
 
 # from var.commands.Commands import Commands
 from utils.messages.todo.messageReplyFilter import filter_todo_reply
@@ -59,16 +66,19 @@ def setup_handlers(application: Application) -> None:
     # Add command handlers to the application
     for handler in command_handlers:
         application.add_handler(handler)
+    # pages of /todos
+    application.add_handler(
+        CallbackQueryHandler(todos_page, pattern=rf"^{TODOS_CALLBACK_PREFIX}:")
+    )
+    application.add_handler(
+        CallbackQueryHandler(findtodo_page, pattern=rf"^{FIND_CALLBACK_PREFIX}:")
+    )
 
     # DUMB HANDLERS
-    for pattern, _ in handler_mapping.items():
-        # Add a message handler for each pattern in the handler_mapping
-        application.add_handler(
-            MessageHandler(filters.Regex(pattern), handle_dumb_message)
-        )
-        application.add_handler(
-            MessageHandler(filters.CaptionRegex(pattern), handle_dumb_message)
-        )
+    # a single handler matching every pattern of handler_mapping on text and captions
+    application.add_handler(
+        MessageHandler(filter_dumb_triggers, handle_dumb_message)
+    )
 
     application.add_handler(
         add_todo_handler, group=1
@@ -1,4 +1,5 @@
-from utils.auth.users_db import insert_new_user, UserDbCodes
+from utils.auth.users_db import UserDbCodes
+from utils.db.aio import users_db
 from telegram import Update
 from telegram.ext import ContextTypes
 
@@ -13,7 +14,7 @@ async def addme(update: Update, context: ContextTypes.DEFAULT_TYPE):
         is_admin = False
 
         # Add the user to the database
-        code = insert_new_user(user_id, username, first_name, last_name, language_code, is_admin)
+        code = await users_db.insert_new_user(user_id, username, first_name, last_name, language_code, is_admin)
         if code == UserDbCodes.USER_ALREADY_EXISTS.value:
             await update.effective_message.reply_text(
                 text="Sei già un utente autorizzato!",
@@ -2,16 +2,9 @@ from telegram import Update
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 
-from utils.messages.dice.dice_util_v2 import (
-    get_monthly_players,
-    play_bowling,
-    play_bulls_eye,
-    play_dice,
-    play_slot_machine,
-    play_basket,
-    play_soccer,
-)
+from utils.db.aio import dice_util
 from utils.auth.auth import chat_restricted, Chat
+from utils.media.media_util import send_cached_media
 
 from var.messages.dice.slot import getMessage, FAST_RESPONSES, RESULT_CODES, getWinAnimFile, Game
 import asyncio
@@ -19,20 +12,18 @@ import logging
 
 log = logging.getLogger("dice")
 chats = [Chat(-1002364188805, 25544), Chat(-4594212673), Chat(-1002351154885)]
+REPLY_DELAY = 3  # seconds, roughly the length of the dice animation
 
-async def _handle_game(update: Update, check_function, wonAnimation=None):
-    """Common handler for dice games."""
-    composed_user = f"{update.effective_user.username}_!_{update.effective_user.id}"
-    won, code = check_function(composed_user, update.message.dice.value)
-    if code not in FAST_RESPONSES:
-        await asyncio.sleep(3)  # Delay to avoid spoilers
+async def _send_game_reply(update: Update, won: bool, code: RESULT_CODES, wonAnimation=None):
+    """Reply with the outcome of a game."""
     if won and code != RESULT_CODES.ALREADY_PLAYED:
         if wonAnimation:
-            with open(wonAnimation, "rb") as file:
-                await update.effective_message.reply_photo(
-                    photo=file,
-                    caption=f"Vincita di {update.effective_user.first_name}!\n{getMessage(code)}",
-                )
+            await send_cached_media(
+                update.effective_message.reply_photo,
+                "photo",
+                wonAnimation,
+                caption=f"Vincita di {update.effective_user.first_name}!\n{getMessage(code)}",
+            )
         else:
             await update.effective_message.reply_text(
                 text=f"Vincita di {update.effective_user.first_name}!\n{getMessage(code)}",
@@ -41,40 +32,59 @@ async def _handle_game(update: Update, check_function, wonAnimation=None):
         await update.effective_message.reply_text(text=getMessage(code), do_quote=True)
 
 
+async def _send_game_reply_later(delay: float, update: Update, won: bool, code: RESULT_CODES, wonAnimation=None):
+    await asyncio.sleep(delay)
+    await _send_game_reply(update, won, code, wonAnimation)
+
+
+async def _handle_game(update: Update, context: ContextTypes.DEFAULT_TYPE, check_function, wonAnimation=None):
+    """Common handler for dice games."""
+    composed_user = f"{update.effective_user.username}_!_{update.effective_user.id}"
+    won, code = await check_function(composed_user, update.message.dice.value)
+    if code in FAST_RESPONSES:
+        await _send_game_reply(update, won, code, wonAnimation)
+        return
+    # Delay to avoid spoilers, in the background so the next updates aren't held up
+    context.application.create_task(
+        _send_game_reply_later(REPLY_DELAY, update, won, code, wonAnimation),
+        update=update,
+    )
+
+
 @chat_restricted(chats)
 async def dice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the dice roll."""
-    await _handle_game(update, play_dice, getWinAnimFile(Game.DICE))
+    await _handle_game(update, context, dice_util.play_dice, getWinAnimFile(Game.DICE))
 
 
 @chat_restricted(chats)
 async def slot(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the slot machine roll."""
-    await _handle_game(update, play_slot_machine, getWinAnimFile(Game.SLOT_MACHINE))
+    await _handle_game(update, context, dice_util.play_slot_machine, getWinAnimFile(Game.SLOT_MACHINE))
 
 
 @chat_restricted(chats)
 async def bullseye(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the bullseye roll."""
-    await _handle_game(update, play_bulls_eye, getWinAnimFile(Game.DARTS))
+    await _handle_game(update, context, dice_util.play_bulls_eye, getWinAnimFile(Game.DARTS))
 
 
 @chat_restricted(chats)
 async def bowling(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the bowling roll."""
-    await _handle_game(update, play_bowling, getWinAnimFile(Game.BOWLING))
+    await _handle_game(update, context, dice_util.play_bowling, getWinAnimFile(Game.BOWLING))
 
 
 @chat_restricted(chats)
 async def basket(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the basketball roll."""
-    await _handle_game(update, play_basket, getWinAnimFile(Game.BASKETBALL))
+    await _handle_game(update, context, dice_util.play_basket, getWinAnimFile(Game.BASKETBALL))
 
 
 @chat_restricted(chats)
 async def soccer(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the soccer roll."""
-    await _handle_game(update, play_soccer)
+    await _handle_game(update, context, dice_util.play_soccer)
 
 
 @chat_restricted(chats)
@@ -88,7 +98,7 @@ async def spattemu(update: Update, context: ContextTypes.DEFAULT_TYPE):
             text="Usage: spattemu <cost of pranz>"
         )
         return
-    players = get_monthly_players()
+    players = await dice_util.get_monthly_players()
     log.debug(f"Players: {players}")
     if len(players) < 0:
         await update.effective_message.reply_text(text="No players found")
@@ -3,8 +3,11 @@ import re
 from telegram import Message, Update
 from telegram.helpers import escape_markdown
 from telegram.ext import ContextTypes
-import utils.messages.dumb.mbarometro_util_v2 as mbarometro_util
+from utils.db.aio import mbarometro_util
 from utils.messages.dumb.utils import find_word
+from utils.messages.dumb.triggers import TriggerEngine, TriggerFilter
+from utils.media.media_util import send_cached_media
+from utils.telegram.rate_limiter import SendPriority, StaleSendError, send_priority
 from var.messages.dumb import MediaInfo, PREPUZIO, LETSGOSKY, CARTOCCIATA, RECORDED, CEO
 from var.messages import SendMediaErrors
 
@@ -46,6 +49,9 @@ async def send_media_message(
         log.error(f"Invalid media_param_name: {media_param_name}")
         return
     try:
+        if not tg_file_id:
+            # e.g. no prefetched unsplash image yet
+            raise ValueError(f"No file_id available for {media_param_name}")
         await send_media_method(
             **{media_param_name: tg_file_id},
             # do_quote= update.message.build_reply_arguments(quote=quote_text) if quote_text else False,
@@ -56,11 +62,11 @@ async def send_media_message(
         # if the file_id is not valid, try to send the media file using the file_location
         if file_location:
             try:
-                with open(file_location, "rb") as media_file:
-                    image: Message = await send_media_method(
-                        **{media_param_name: media_file}, do_quote=False
-                    )
-                    # await update.effective_chat.send_message(text="sent from file", reply_to_message_id=image.message_id)
+                # uploaded once, then sent again by the file_id telegram assigned to it
+                image: Message = await send_cached_media(
+                    send_media_method, media_param_name, file_location, do_quote=False
+                )
+                # await update.effective_chat.send_message(text="sent from file", reply_to_message_id=image.message_id)
             except Exception as e:
                 log.error(e)
                 await update.effective_message.reply_text(e, do_quote=False)
@@ -126,7 +132,7 @@ async def mbarometro(update: Update, context: ContextTypes.DEFAULT_TYPE, match=N
     actual_message_text = update.message.text or update.message.caption or ""
     # mbare_message_count = update.message.text.lower().count("mbare")
     mbare_message_count = len(re.findall(r"\bmbare\b", actual_message_text, re.IGNORECASE))
-    user_count, total = mbarometro_util.increment(user, mbare_message_count)
+    user_count, total = await mbarometro_util.increment(user, mbare_message_count)
 
     text = "*Mbarometro* 📊\n\n"
     text += f"This message contains: {mbare_message_count}\n"
@@ -135,7 +141,7 @@ async def mbarometro(update: Update, context: ContextTypes.DEFAULT_TYPE, match=N
         text += " 🎉\n\n"
     else:
         text += "\n\n"
-    for user in mbarometro_util.get_all():
+    for user in await mbarometro_util.get_all():
         text += f"{escape_markdown(user['user'])} : {user['value']}\n"
     text += f"\nTotal count: {total}"
     if total % 100 == 0:
@@ -177,22 +183,26 @@ handler_mapping = {
     ): recorded,
 }
 
+trigger_engine = TriggerEngine(handler_mapping)
+filter_dumb_triggers = TriggerFilter(trigger_engine)
+
+@send_priority(SendPriority.LOW)
 async def handle_dumb_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Handle dumb messages based on the regex patterns defined in handler_mapping.
+    The triggers found by filter_dumb_triggers are handled once each.
+    Replies are sent with low priority, and given up on when the bot is flooded.
     """
     log.debug(f"Received message: {update.message.text}")
     log.debug(f"Received caption: {update.message.caption}")
 
-    to_check = update.message.text or update.message.caption
-    for pattern, handler in handler_mapping.items():
-        match = re.search(pattern, to_check)
-        # if re.search(pattern, to_check):
-        if match:
-            # If a match is found, call the corresponding handler
-            log.debug(f"Matched pattern: {pattern.pattern}")
-            # log.debug(f"Match: {re.search(pattern, to_check).group(0)}")
-            log.debug(f"Match: {match.group(0)}")
-            log.debug(f"Calling handler: {handler.__name__}")
-            await handler(update, context, match.group(0))
-            # break , # to stop after the first match
\ No newline at end of file
+    for hit in context.triggers:
+        # Call the handler of each trigger found in the message
+        log.debug(f"Match: {hit.text} at {hit.span}")
+        log.debug(f"Calling handler: {hit.handler.__name__}")
+        try:
+            await hit.handler(update, context, hit.text)
+        except StaleSendError as e:
+            # the next replies would be even later
+            log.info(f"Dumb reply to {update.effective_chat.id} dropped: {e}")
+            return
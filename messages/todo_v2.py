@@ -1,20 +1,20 @@
+import asyncio
 import textwrap
+from datetime import datetime
 from enum import Enum
-from typing import Callable, Optional, Tuple, TypeVar, Union
+from typing import Awaitable, Callable, List, Optional, Tuple, TypeVar, Union
 
-from telegram import Update, Message
-from telegram.ext import ContextTypes
+from telegram import Bot, Update, Message
+from telegram.error import BadRequest, Forbidden, TelegramError
+from telegram.ext import Application, ContextTypes
 from utils.escape import escape_protected_chars
 from utils.auth.auth import Chat, chat_restricted
-from utils.messages.todo.todo_db import (
-    TodoItem,
-    add_todo_item,
-    get_todo_item_by_message_id,
-    set_todo_item_message_id,
-    set_todo_item_network,
-    set_todo_item_priority,
-    set_todo_item_status,
-)
+from utils.telegram.rate_limiter import SendPriority, send_priority
+from utils.telegram.delete_queue import delete_queue
+from utils.telegram.edit_scheduler import edit_scheduler
+from utils.messages.todo.todo_db import TodoItem, TodoMove, reserve_todo_id
+from utils.messages.todo.message_index import todo_message_index
+from utils.db.aio import todo_db
 import logging
 import os
 
@@ -30,6 +30,9 @@ if mode != "prod" and mode != "PROD":
     chat = debug_chat
     completed_chat = debug_completed_chat
 
+# todos moved at the same time by the bulk commands
+MAX_CONCURRENT_MOVES = 4
+
 T = TypeVar('T', bound=Union[TodoItem.Status, TodoItem.Priority])
 
 class UpdateType(Enum):
@@ -42,7 +45,7 @@ async def _common_update_handler(
     update: Update,
     context: ContextTypes.DEFAULT_TYPE,
     update_type: UpdateType,
-    update_func: Callable,
+    update_func: Callable[..., Awaitable[TodoItem]],
     value_type: Optional[type] = None,
     move_on_status_change: bool = False
 ) -> None:
@@ -53,21 +56,22 @@ async def _common_update_handler(
         update: The update object
         context: The context object
         update_type: The type of update (status, priority, network)
-        update_func: The function to call to update the todo item
+        update_func: The async db function to call to update the todo item
         value_type: The enum type to convert the value to (if applicable)
         move_on_status_change: Whether to move the item between chats when status changes
     """
-    # Get original todo item
+    # Get original todo item, the todo id of a recent message is already known
     original_todo_message_id = update.message.reply_to_message.id
-    original_todo_item = get_todo_item_by_message_id(original_todo_message_id)
-    
-    if original_todo_item is None:
-        await update.effective_message.reply_text(
-            text="Non riesco a trovare il todo a cui stai rispondendo",
-            do_quote=False,
-        )
-        return
-    
+    original_todo_id = todo_message_index.get(original_todo_message_id)
+    original_todo_item = None
+    if original_todo_id is None or (move_on_status_change and update_type == UpdateType.STATUS):
+        # not a recent message, or a status change: the current status decides the move
+        original_todo_item = await todo_db.get_todo_item_by_message_id(original_todo_message_id)
+        if original_todo_item is None:
+            await _todo_not_found(update, original_todo_message_id)
+            return
+        original_todo_id = original_todo_item.id
+
     # Extract and convert the value
     raw_value = update.message.text.lower()[len(update_type.value) + 1:].strip()
     
@@ -83,71 +87,156 @@ async def _common_update_handler(
     else:
         value = raw_value
     
-    # Update the todo item
-    updated_todo = update_func(original_todo_item.id, value)
-    
-    # Handle status updates that require moving the todo between chats
+    # Moving the todo between chats when the status changes
+    move = None
     if move_on_status_change and update_type == UpdateType.STATUS:
         current_chat = update.effective_chat
-        
+        target_chat = None
         if value == TodoItem.Status.DONE:
             # Move from active to completed chat
             target_chat = completed_chat
-            source_chat = current_chat
         elif original_todo_item.status == TodoItem.Status.DONE:
             # Move from completed back to active chat
             target_chat = chat
             # target_chat = debug_chat
-            source_chat = current_chat
-        else:
-            # No need to move, just update in place
-            await context.bot.edit_message_text(
-                chat_id=current_chat.id,
-                message_id=original_todo_message_id,
-                text=escape_protected_chars(f"{updated_todo}"),
-                parse_mode="MarkdownV2",
+        if target_chat is not None:
+            move = TodoMove(
+                todo_id=original_todo_id,
+                source_chat_id=current_chat.id,
+                source_message_id=original_todo_message_id,
+                target_chat_id=target_chat.id,
+                target_thread_id=target_chat.thread_id,
             )
-            await _try_delete_message(update.message)
+
+    if move is not None:
+        # Update the todo item and record the move in the outbox in one transaction,
+        # so the move can be finished if the bot stops halfway
+        updated_todo = await todo_db.set_todo_item_status(original_todo_id, value, move)
+        if updated_todo is None:
+            await _todo_not_found(update, original_todo_message_id)
             return
-        
-        # Send to target chat and update message ID in DB
-        new_message = await context.bot.send_message(
-            chat_id=target_chat.id,
-            message_thread_id=target_chat.thread_id,
-            text=escape_protected_chars(f"{updated_todo}"),
-            parse_mode="MarkdownV2",
-        )
-        
-        # Update the message ID in the database
-        set_todo_item_message_id(updated_todo.id, new_message.message_id)
-        
-        # Delete the original message
-        try:
-            await context.bot.delete_message(
-                chat_id=source_chat.id,
-                message_id=original_todo_message_id,
-            )
-        except Exception as e:
-            log.error(f"Error deleting message: {e}")
+        await _move_todo(context.application, move, escape_protected_chars(f"{updated_todo}"))
     else:
-        # Update the original message
-        await context.bot.edit_message_text(
-            chat_id=update.effective_chat.id,
-            message_id=original_todo_message_id,
-            text=escape_protected_chars(f"{updated_todo}"),
+        # Update the todo item
+        updated_todo = await update_func(original_todo_id, value)
+        if updated_todo is None:
+            await _todo_not_found(update, original_todo_message_id)
+            return
+        # Update the original message, quick updates of the same todo are sent as one edit
+        edit_scheduler.schedule(
+            context.bot,
+            update.effective_chat.id,
+            original_todo_message_id,
+            escape_protected_chars(f"{updated_todo}"),
             parse_mode="MarkdownV2",
         )
     
     # Delete the command message
-    await _try_delete_message(update.message)
+    _delete_later(update.message)
+
+
+async def _todo_not_found(update: Update, message_id: int) -> None:
+    todo_message_index.discard(message_id)
+    await update.effective_message.reply_text(
+        text="Non riesco a trovare il todo a cui stai rispondendo",
+        do_quote=False,
+    )
+
+
+async def _move_todo(application: Application, move: TodoMove, todo_text: str) -> None:
+    """
+    Send the todo to the target chat, then delete the old message while the
+    new message id is saved, and remove the move from the outbox in the background.
+    A move already sent (resumed after a restart) only deletes the old message.
+    """
+    bot = application.bot
+    saved = None
+    if move.new_message_id is None:
+        new_message = await bot.send_message(
+            chat_id=move.target_chat_id,
+            message_thread_id=move.target_thread_id,
+            text=todo_text,
+            parse_mode="MarkdownV2",
+        )
+        edit_scheduler.remember(move.target_chat_id, new_message.message_id, todo_text)
+        move.new_message_id = new_message.message_id
+        saved = todo_db.set_todo_move_sent(move.todo_id, move.new_message_id)
+
+    # an edit still pending for the old message is pointless
+    edit_scheduler.cancel(move.source_chat_id, move.source_message_id)
+    deleted, _ = await asyncio.gather(
+        _delete_old_message(bot, move),
+        saved or asyncio.sleep(0),
+    )
+    if deleted:
+        finished = todo_db.finish_todo_move(move.todo_id)
+        if application.running:
+            # nothing waits on it, the outbox only matters after a restart
+            application.create_task(finished)
+        else:
+            await finished
+
+
+async def move_todos(application: Application, moves: List[Tuple[TodoMove, str]]) -> None:
+    """
+    Move many todos, (move, todo text) each, already recorded in the outbox.
+    At most MAX_CONCURRENT_MOVES at a time, the rate limiter paces their requests.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_MOVES)
 
+    async def move_one(move: TodoMove, todo_text: str) -> None:
+        async with semaphore:
+            try:
+                await _move_todo(application, move, todo_text)
+            except TelegramError as e:
+                await _move_failed(move, e)
 
-async def _try_delete_message(message) -> None:
-    """Attempt to delete a message, log but ignore errors."""
+    await asyncio.gather(*(move_one(move, todo_text) for move, todo_text in moves))
+
+
+async def _move_failed(move: TodoMove, error: TelegramError) -> None:
+    """
+    Keep a failed move in the outbox to resume it at the next start, unless
+    retrying can't help, e.g. the text is rejected by the MarkdownV2 parser
+    or the bot was removed from the chat: then the move is dropped.
+    """
+    if isinstance(error, (BadRequest, Forbidden)):
+        log.error(f"Dropping the move of todo {move.todo_id}, it can't be sent: {error}")
+        await todo_db.finish_todo_move(move.todo_id)
+    else:
+        log.error(f"Error moving todo {move.todo_id}, it stays in the outbox: {error}")
+
+
+async def _delete_old_message(bot: Bot, move: TodoMove) -> bool:
+    """Delete the message the todo was moved from, False if it should be retried."""
     try:
-        await message.delete()
-    except Exception as e:
+        await bot.delete_message(chat_id=move.source_chat_id, message_id=move.source_message_id)
+    except (BadRequest, Forbidden) as e:
+        # already deleted or out of reach, retrying won't help
         log.error(f"Error deleting message: {e}")
+    except TelegramError as e:
+        log.error(f"Error deleting message, todo {move.todo_id} stays in the outbox: {e}")
+        return False
+    return True
+
+
+async def resume_todo_moves(application: Application) -> None:
+    """Finish the todo moves interrupted by a restart, called at startup."""
+    for move in await todo_db.get_pending_todo_moves():
+        todo_item = await todo_db.get_todo_item(move.todo_id)
+        if todo_item is None:
+            await todo_db.finish_todo_move(move.todo_id)
+            continue
+        log.info(f"Resuming the move of todo {move.todo_id} to {move.target_chat_id}")
+        try:
+            await _move_todo(application, move, escape_protected_chars(f"{todo_item}"))
+        except TelegramError as e:
+            await _move_failed(move, e)
+
+
+def _delete_later(message: Message) -> None:
+    """Queue a message for deletion, deleted in bulk with the others of the chat."""
+    delete_queue.delete(message)
 
 
 async def status_update_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -155,7 +244,7 @@ async def status_update_handler(update: Update, context: ContextTypes.DEFAULT_TY
         update=update,
         context=context,
         update_type=UpdateType.STATUS,
-        update_func=set_todo_item_status,
+        update_func=todo_db.set_todo_item_status,
         value_type=TodoItem.Status,
         move_on_status_change=True
     )
@@ -166,7 +255,7 @@ async def priority_update_handler(update: Update, context: ContextTypes.DEFAULT_
         update=update,
         context=context,
         update_type=UpdateType.PRIORITY,
-        update_func=set_todo_item_priority,
+        update_func=todo_db.set_todo_item_priority,
         value_type=TodoItem.Priority
     )
 
@@ -176,7 +265,7 @@ async def network_update_handler(update: Update, context: ContextTypes.DEFAULT_T
         update=update,
         context=context,
         update_type=UpdateType.NETWORK,
-        update_func=set_todo_item_network
+        update_func=todo_db.set_todo_item_network
     )
 
 
@@ -220,6 +309,7 @@ def _message_to_handler(text: str) -> Optional[Callable]:
     return None
 
 
+@send_priority(SendPriority.HIGH)
 @chat_restricted([chat, completed_chat], notify=False)
 async def todoInfo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
@@ -257,29 +347,57 @@ async def todoInfo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     )
 
 
+@send_priority(SendPriority.HIGH)
 @chat_restricted([chat], notify=False)
 async def addTodo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     todo_text = update.message.text
+    # the id is reserved and the date set here, so the message can be sent
+    # first and the todo inserted with its message id in a single write
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     todo_item = TodoItem(
         text=todo_text,
         user_id=update.effective_user.id,
+        db_id=reserve_todo_id(),
+        date=now,
+        update_date=now,
     )
 
-    # Add the todo item to the database
-    todo_item = add_todo_item(todo_item)
-
     # Send a new message with the todo item
+    todo_text = escape_protected_chars(f"{todo_item}")
     message = await update.effective_message.reply_text(
-        text=escape_protected_chars(f"{todo_item}"),
+        text=todo_text,
         parse_mode="MarkdownV2",
         do_quote=False,
     )
-    set_todo_item_message_id(todo_item.id, message.message_id)
+    edit_scheduler.remember(message.chat_id, message.message_id, todo_text)
+
+    # Add the todo item to the database
+    saved_item = await todo_db.add_todo_item(todo_item, message.message_id)
+    if saved_item is None:
+        log.error(f"Todo {todo_item.id} sent in message {message.message_id} but not saved")
+        # the forwarded message stays, to be forwarded again
+        edit_scheduler.cancel(message.chat_id, message.message_id)
+        _delete_later(message)
+        await update.effective_message.reply_text(
+            text="Errore nel salvataggio del todo, riprova",
+            do_quote=False,
+        )
+        return
+    if saved_item.id != todo_item.id:
+        # the reserved id was taken by another process, the message shows the wrong one
+        edit_scheduler.schedule(
+            context.bot,
+            message.chat_id,
+            message.message_id,
+            escape_protected_chars(f"{saved_item}"),
+            parse_mode="MarkdownV2",
+        )
     
     # Delete the original message
-    await _try_delete_message(update.message)
+    _delete_later(update.message)
 
 
+@send_priority(SendPriority.HIGH)
 @chat_restricted([chat, completed_chat], notify=False)
 async def updateTodo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
@@ -299,9 +417,10 @@ async def updateTodo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
         )
 
 
+@send_priority(SendPriority.HIGH)
 @chat_restricted([chat, completed_chat], notify=False)
 async def deleteUnwantedMessage(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
     Delete the message that triggered the command.
     """
-    await _try_delete_message(update.message)
\ No newline at end of file
+    _delete_later(update.message)
\ No newline at end of file
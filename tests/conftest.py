@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# the db modules open DB_FILE_PATH when they are imported, keep the tests off the real db
+os.environ["DB_FILE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="tests-"), "db.db")
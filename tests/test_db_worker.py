@@ -0,0 +1,82 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from utils.db import storage
+from utils.db.aio import DBWorker
+
+TABLE = "worker_test"
+
+
+def setup_module():
+    with storage.connection() as conn:
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {TABLE} (value INTEGER)")
+
+
+def insert(value: int):
+    with storage.connection() as conn:
+        conn.execute(f"INSERT INTO {TABLE} (value) VALUES (?)", (value,))
+    return value
+
+
+def values():
+    with storage.connection() as conn:
+        return [row[0] for row in conn.execute(f"SELECT value FROM {TABLE} ORDER BY value")]
+
+
+def end_transaction_and_raise():
+    # the savepoint of the job goes away with the transaction, ROLLBACK TO job fails
+    with storage.connection() as conn:
+        conn.execute("ROLLBACK")
+    raise ValueError("boom")
+
+
+def end_transaction():
+    # RELEASE job fails
+    with storage.connection() as conn:
+        conn.execute("ROLLBACK")
+
+
+@pytest.fixture
+def worker():
+    with storage.connection() as conn:
+        conn.execute(f"DELETE FROM {TABLE}")
+    worker = DBWorker(name="test-worker", commit_window_ms=50)
+    yield worker
+    worker.stop(timeout=5)
+
+
+def test_failing_call_only_undoes_its_own_writes(worker):
+    async def main():
+        def insert_and_raise():
+            insert(2)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            worker.run(insert, 1), worker.run(insert_and_raise), worker.run(insert, 3),
+            return_exceptions=True,
+        )
+        assert results[0] == 1 and results[2] == 3
+        assert isinstance(results[1], ValueError)
+
+    asyncio.run(main())
+    assert values() == [1, 3]
+
+
+@pytest.mark.parametrize("job", [end_transaction_and_raise, end_transaction])
+def test_failing_savepoint_resolves_every_caller(worker, job):
+    async def main():
+        # queued together, so they share a batch
+        first = asyncio.wrap_future(worker.submit(insert, 1))
+        failing = asyncio.wrap_future(worker.submit(job))
+        with pytest.raises(sqlite3.OperationalError):
+            await asyncio.wait_for(failing, 5)
+        # the batch is lost with the call that broke it
+        with pytest.raises(sqlite3.Error):
+            await asyncio.wait_for(first, 5)
+        # and the worker keeps going
+        assert await asyncio.wait_for(worker.run(insert, 2), 5) == 2
+
+    asyncio.run(main())
+    assert values() == [2]
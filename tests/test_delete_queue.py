@@ -0,0 +1,46 @@
+import asyncio
+
+from telegram.error import TimedOut
+
+from utils.telegram.delete_queue import DeleteQueue
+
+
+class FakeBot:
+    def __init__(self, latency: float = 0.0, failures: int = 0):
+        self.latency = latency
+        self.failures = failures
+        self.deleted = []
+
+    async def delete_messages(self, chat_id, message_ids):
+        await asyncio.sleep(self.latency)
+        if self.failures:
+            self.failures -= 1
+            raise TimedOut()
+        self.deleted.append((chat_id, sorted(message_ids)))
+
+
+def test_close_waits_for_the_deletions_in_flight():
+    async def main():
+        bot = FakeBot(latency=0.2)
+        queue = DeleteQueue(interval=0.01)
+        queue.delete_by_id(bot, 1, 10)
+        await asyncio.sleep(0.05)  # the interval is over, the batch is being deleted
+        bot.latency = 0
+        queue.delete_by_id(bot, 1, 11)
+        await queue.close()
+        return bot.deleted
+
+    assert sorted(asyncio.run(main())) == [(1, [10]), (1, [11])]
+
+
+def test_no_retry_after_close():
+    async def main():
+        bot = FakeBot(failures=1)
+        queue = DeleteQueue(interval=0.01, retry_delay=0.05)
+        queue.delete_by_id(bot, 1, 10)
+        await queue.close()  # the deletion fails, its retry is scheduled
+        await asyncio.sleep(0.1)
+        assert queue._task is None and not queue._pending
+        return bot.deleted
+
+    assert asyncio.run(main()) == []
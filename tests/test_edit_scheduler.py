@@ -0,0 +1,41 @@
+import asyncio
+
+from utils.telegram.edit_scheduler import EditScheduler
+
+
+class SlowBot:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.edits = []
+
+    async def edit_message_text(self, chat_id, message_id, text, parse_mode=None):
+        await asyncio.sleep(self.latency)
+        self.edits.append((chat_id, message_id, text))
+
+
+def test_close_waits_for_the_edits_being_sent():
+    async def main():
+        bot = SlowBot(latency=0.2)
+        scheduler = EditScheduler(window=0.01)
+        scheduler.schedule(bot, 1, 10, "sent")
+        await asyncio.sleep(0.05)  # the window is over, the edit is in flight
+        bot.latency = 0
+        scheduler.schedule(bot, 1, 11, "pending")
+        await scheduler.close()
+        return bot.edits
+
+    assert sorted(asyncio.run(main())) == [(1, 10, "sent"), (1, 11, "pending")]
+
+
+def test_edits_within_the_window_are_coalesced():
+    async def main():
+        bot = SlowBot(latency=0)
+        scheduler = EditScheduler(window=0.01)
+        for text in ("a", "b", "c"):
+            scheduler.schedule(bot, 1, 10, text)
+        await asyncio.sleep(0.05)
+        scheduler.schedule(bot, 1, 10, "c")  # what the message already shows
+        await scheduler.close()
+        return bot.edits
+
+    assert asyncio.run(main()) == [(1, 10, "c")]
@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+import pytest
+from telegram.ext import ExtBot
+
+from bench.fakebot import FakeRequest
+from utils.telegram.rate_limiter import PriorityRateLimiter, SendPriority, StaleSendError
+
+GROUP = -100
+OTHER_GROUP = -200
+
+
+def make_bot(request: FakeRequest, **limits) -> ExtBot:
+    limits.setdefault("group_burst", 1)
+    return ExtBot("1:test", request=request, get_updates_request=FakeRequest(latency=0), rate_limiter=PriorityRateLimiter(**limits))
+
+
+def test_high_priority_sends_go_first():
+    async def main():
+        request = FakeRequest(latency=0)
+        async with make_bot(request, group_rate=20) as bot:
+            await bot.send_message(GROUP, "first")  # takes the only token of the chat
+            await asyncio.gather(*(
+                bot.send_message(GROUP, priority.name, rate_limit_args=priority)
+                for priority in (SendPriority.LOW, SendPriority.LOW, SendPriority.NORMAL, SendPriority.HIGH)
+            ))
+        return [params["text"] for params in request.sent()]
+
+    assert asyncio.run(main()) == ["first", "HIGH", "NORMAL", "LOW", "LOW"]
+
+
+def test_retry_after_pauses_only_that_chat():
+    async def main():
+        request = FakeRequest(latency=0, retry_after={"sendMessage": 1})
+        sent_at = {}
+        async with make_bot(request, group_burst=5) as bot:
+            start = time.monotonic()
+
+            async def send(chat_id):
+                await bot.send_message(chat_id, str(chat_id))
+                sent_at[chat_id] = time.monotonic() - start
+
+            paused = asyncio.create_task(send(GROUP))  # gets the 429
+            await asyncio.sleep(0.05)
+            await send(OTHER_GROUP)
+            await send(OTHER_GROUP)
+            await paused
+            retried = bot.rate_limiter.metrics()["retried"]
+        return sent_at, retried
+
+    sent_at, retried = asyncio.run(main())
+    assert retried == 1
+    assert sent_at[OTHER_GROUP] < 0.5
+    assert sent_at[GROUP] == pytest.approx(1, abs=0.3)
+
+
+def test_stale_low_sends_are_dropped():
+    async def main():
+        request = FakeRequest(latency=0)
+        async with make_bot(request, group_rate=4, max_low_wait=0.1) as bot:
+            await bot.send_message(GROUP, "first")
+            low = bot.send_message(GROUP, "low", rate_limit_args=SendPriority.LOW)
+            normal = bot.send_message(GROUP, "normal", rate_limit_args=SendPriority.NORMAL)
+            results = await asyncio.gather(low, normal, return_exceptions=True)
+            dropped = bot.rate_limiter.metrics()["dropped"]
+        return results, dropped, [params["text"] for params in request.sent()]
+
+    (low, normal), dropped, sent = asyncio.run(main())
+    assert isinstance(low, StaleSendError)
+    assert normal.text == "normal"
+    assert dropped == 1
+    assert sent == ["first", "normal"]
@@ -0,0 +1,52 @@
+import asyncio
+import json
+
+import pytest
+
+from bench.fakebot import FakeRequest, build_app
+from messages.todo_v2 import chat, completed_chat, resume_todo_moves
+from utils.messages.todo import todo_db
+from utils.messages.todo.todo_db import TodoItem, TodoMove
+
+
+class FailingRequest(FakeRequest):
+    """sendMessage always fails with the given status code."""
+
+    def __init__(self, status: int, description: str):
+        super().__init__(latency=0)
+        self.status = status
+        self.description = description
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        if url.endswith("/sendMessage"):
+            self.calls.append((0, "sendMessage", request_data.parameters))
+            return self.status, json.dumps({"ok": False, "error_code": self.status, "description": self.description}).encode()
+        return await super().do_request(url, method, request_data, **kwargs)
+
+
+def pending_move() -> int:
+    for move in todo_db.get_pending_todo_moves():
+        todo_db.finish_todo_move(move.todo_id)
+    todo = todo_db.add_todo_item(TodoItem(text="todo", user_id="1"))
+    todo_db.set_todo_item_message_id(todo.id, 90_000 + todo.id)
+    move = TodoMove(todo.id, chat.id, 90_000 + todo.id, completed_chat.id, completed_chat.thread_id)
+    todo_db.set_todo_item_status(todo.id, TodoItem.Status.DONE, move)
+    return todo.id
+
+
+@pytest.mark.parametrize("status, description, kept", [
+    (400, "Bad Request: can't parse entities: character '.' is reserved", False),
+    (403, "Forbidden: bot was kicked from the supergroup chat", False),
+    (502, "Bad Gateway", True),
+])
+def test_resume_drops_moves_that_cant_be_sent(status, description, kept):
+    todo_id = pending_move()
+    request = FailingRequest(status, description)
+
+    async def main():
+        async with build_app(request) as application:
+            await resume_todo_moves(application)
+
+    asyncio.run(main())
+    assert len(request.sent()) == 1
+    assert [move.todo_id for move in todo_db.get_pending_todo_moves()] == ([todo_id] if kept else [])
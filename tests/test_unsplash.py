@@ -0,0 +1,174 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from utils.messages.dumb.unsplash import UnsplashProvider
+from var.messages.dumb import dumb
+
+
+class StandIn(ThreadingHTTPServer):
+    """A local stand-in for the Unsplash API, answering /photos/random with `count` fake photos."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.status = 200
+        self.remaining = "50"
+        self.delay = 0.0
+        self.requests = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server: StandIn = self.server
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        server.requests.append((url.path, params, self.headers.get("Authorization")))
+        time.sleep(server.delay)
+
+        count = int(params.get("count", ["1"])[0])
+        query = params.get("query", ["random"])[0]
+        body = b"{}"
+        if server.status == 200:
+            body = json.dumps(
+                [{"urls": {"small": f"{server.url}/{query}/{i}.jpg"}} for i in range(count)]
+            ).encode()
+        self.send_response(server.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Ratelimit-Remaining", server.remaining)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in():
+    server = StandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+async def settle(provider: UnsplashProvider):
+    """Wait for the running refills to finish."""
+    while provider._refills:
+        await asyncio.gather(*provider._refills.values(), return_exceptions=True)
+
+
+def test_take_never_blocks(stand_in):
+    async def main():
+        stand_in.delay = 0.5
+        provider = UnsplashProvider("key", base_url=stand_in.url, batch_size=5, low_water=1)
+        await provider.start(["food"])
+
+        started = time.perf_counter()
+        assert provider.take("food") is None  # the refill is still waiting on the api
+        assert time.perf_counter() - started < 0.05
+
+        await settle(provider)
+        assert provider.take("food") == f"{stand_in.url}/food/0.jpg"
+        await provider.close()
+
+    asyncio.run(main())
+    path, params, auth = stand_in.requests[0]
+    assert path == "/photos/random"
+    assert params == {"query": ["food"], "count": ["5"]}
+    assert auth == "Client-ID key"
+
+
+def test_batch_size_defaults_to_the_api_max(stand_in):
+    async def main():
+        provider = UnsplashProvider("key", base_url=stand_in.url)
+        await provider.start(["food"])
+        await settle(provider)
+        assert len(provider._buffers["food"]) == 30
+        await provider.close()
+
+    asyncio.run(main())
+    assert UnsplashProvider("key", batch_size=100).batch_size == 30
+
+
+@pytest.mark.parametrize("status", [403, 429])
+def test_refills_stop_on_quota_errors(stand_in, status):
+    async def main():
+        stand_in.status = status
+        provider = UnsplashProvider("key", base_url=stand_in.url, batch_size=5)
+        await provider.start(["food"])
+        await settle(provider)
+
+        for _ in range(3):
+            assert provider.take("food") is None
+        await settle(provider)
+        await provider.close()
+
+    asyncio.run(main())
+    assert len(stand_in.requests) == 1
+
+
+def test_refills_stop_when_the_quota_header_reaches_zero(stand_in):
+    async def main():
+        stand_in.remaining = "0"
+        provider = UnsplashProvider("key", base_url=stand_in.url, batch_size=5, low_water=3)
+        await provider.start(["food"])
+        await settle(provider)
+
+        # the last batch is still served, below low_water but without a new request
+        urls = [provider.take("food") for _ in range(6)]
+        await settle(provider)
+        await provider.close()
+        return urls
+
+    urls = asyncio.run(main())
+    assert urls[:5] == [f"{stand_in.url}/food/{i}.jpg" for i in range(5)]
+    assert urls[5] is None
+    assert len(stand_in.requests) == 1
+
+
+def test_empty_buffer_falls_back_to_local_images(stand_in, tmp_path, monkeypatch):
+    for folder in ("eat", "ceo"):
+        (tmp_path / folder).mkdir()
+        (tmp_path / folder / f"{folder}.jpg").write_bytes(b"jpg")
+    monkeypatch.setattr(dumb, "current_directory", tmp_path)
+
+    async def main():
+        stand_in.status = 429
+        provider = UnsplashProvider("key", base_url=stand_in.url)
+        monkeypatch.setattr(dumb, "unsplash", provider)
+        await provider.start(dumb.UNSPLASH_QUERIES)
+        await settle(provider)
+
+        for media, folder in ((dumb.CARTOCCIATA, "eat"), (dumb.CEO, "ceo")):
+            assert media.tg_file_id is None
+            assert media.file_location == tmp_path / folder / f"{folder}.jpg"
+        await provider.close()
+
+    asyncio.run(main())
+
+
+def test_missing_local_folder_gives_no_image(tmp_path, monkeypatch):
+    monkeypatch.setattr(dumb, "current_directory", tmp_path)
+    assert dumb.random_local_image("eat") is None
+
+
+def test_missing_local_folders_are_reported(tmp_path, monkeypatch, caplog):
+    (tmp_path / "eat").mkdir()
+    (tmp_path / "eat" / "eat.jpg").write_bytes(b"jpg")
+    monkeypatch.setenv("DUMB_IMAGES_DIR", str(tmp_path))
+    assert dumb.check_local_images() == ["ceo"]
+    assert "No local images in 'ceo'" in caplog.text
+    assert dumb.random_local_image("eat") == tmp_path / "eat" / "eat.jpg"
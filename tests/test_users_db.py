@@ -0,0 +1,20 @@
+import asyncio
+
+from utils.auth import users_db
+from utils.db import aio
+
+
+def test_refresh_keeps_users_of_an_uncommitted_batch(monkeypatch):
+    # a long window, so the insert is still uncommitted when the refresh is queued
+    monkeypatch.setattr(aio.worker, "commit_window", 0.5)
+
+    async def main():
+        added = aio.worker.submit(users_db.insert_new_user, 424242, "user", "first", "last")
+        refreshed = asyncio.get_running_loop().run_in_executor(None, users_db._refresh_roles)
+        await asyncio.gather(asyncio.wrap_future(added), refreshed)
+
+    asyncio.run(main())
+    assert users_db.is_allowed_user(424242)
+    assert users_db.is_allowed_user("424242")
+    users_db.delete_user("424242")
+    assert not users_db.is_allowed_user(424242)
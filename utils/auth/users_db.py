@@ -1,17 +1,18 @@
 # this file was unproudly vibe coded 
 import os
-import sqlite3
+import time
 import logging
-import dotenv
+import threading
 from enum import Enum, StrEnum, auto
+from utils.db import storage
 
 log = logging.getLogger("users_db")
-dotenv.load_dotenv()
 
 ## DATA
-DB_FILE_PATH = os.getenv('DB_FILE_PATH', './db.db')
 TABLE_NAME = 'users'
-os.makedirs(os.path.dirname(DB_FILE_PATH), exist_ok=True)
+# seconds between background reloads of the roles cache, for when several
+# processes share the db file. 0 = the cache is only changed by this process
+USERS_CACHE_TTL = float(os.getenv('USERS_CACHE_TTL', '0'))
 
 class User(StrEnum):
     ID = 'id'
@@ -33,109 +34,108 @@ class UserDbCodes(Enum):
 
 #init db on module import
 def init_db():
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute(f'''
-    CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
-        {User.ID} INTEGER PRIMARY KEY AUTOINCREMENT,
-        {User.USER_ID} TEXT NOT NULL UNIQUE,
-        {User.USERNAME} TEXT,
-        {User.FIRST_NAME} TEXT,
-        {User.LAST_NAME} TEXT,
-        {User.LANGUAGE_CODE} TEXT,
-        {User.IS_ADMIN} INTEGER DEFAULT 0,
-        {User.DATE} DATE DEFAULT (datetime('now', 'localtime') )
-    )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    with storage.connection() as conn:
+        conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+            {User.ID} INTEGER PRIMARY KEY AUTOINCREMENT,
+            {User.USER_ID} TEXT NOT NULL UNIQUE,
+            {User.USERNAME} TEXT,
+            {User.FIRST_NAME} TEXT,
+            {User.LAST_NAME} TEXT,
+            {User.LANGUAGE_CODE} TEXT,
+            {User.IS_ADMIN} INTEGER DEFAULT 0,
+            {User.DATE} DATE DEFAULT (datetime('now', 'localtime') )
+        )
+        ''')
+
+## ROLES CACHE
+# user_id -> is_admin for every registered user, so auth checks never hit the db
+_roles: dict[str, bool] = {}
+
+def _load_roles():
+    global _roles
+    with storage.connection() as conn:
+        rows = conn.execute(f'''
+        SELECT {User.USER_ID}, {User.IS_ADMIN} FROM {TABLE_NAME}
+        ''').fetchall()
+    _roles = {user_id: bool(admin) for user_id, admin in rows}
+    log.debug(f"Loaded {len(_roles)} users in the roles cache")
+
+def _refresh_roles():
+    """
+    Reload the roles cache on the db worker, after the writes queued before it.
+    Read from another thread it would miss the users added by a batch not
+    committed yet, and drop them from the cache until the next refresh.
+    """
+    from utils.db.aio import worker  # aio imports this module
+    worker.submit(_load_roles).result()
+
+def _refresh_roles_forever():
+    while True:
+        time.sleep(USERS_CACHE_TTL)
+        try:
+            _refresh_roles()
+        except Exception as e:
+            log.error(f"Error refreshing the roles cache: {e}")
 
 init_db()
+_load_roles()
+storage.on_rollback(_load_roles)
+if USERS_CACHE_TTL > 0:
+    threading.Thread(target=_refresh_roles_forever, name="users-cache-refresh", daemon=True).start()
+
+def _row_to_user(user) -> dict:
+    return {
+        User.ID: user[0],
+        User.USER_ID: user[1],
+        User.USERNAME: user[2],
+        User.FIRST_NAME: user[3],
+        User.LAST_NAME: user[4],
+        User.LANGUAGE_CODE: user[5],
+        User.IS_ADMIN: bool(user[6]),
+        User.DATE: user[7]
+    }
 
 ## DB ACCESS
 def is_allowed_user(user_id: str) -> bool:
     """Check if the user id is found in the database."""
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute(f'''
-    SELECT {User.USER_ID} FROM {TABLE_NAME}
-    WHERE {User.USER_ID} = ?
-    ''', (user_id,))
-    result = cursor.fetchone()
-    conn.close()
-    return result is not None
+    return str(user_id) in _roles
 
 def get_user_by_id(user_id: str) -> dict:
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute(f'''
-    SELECT * FROM {TABLE_NAME}
-    WHERE {User.USER_ID} = ?
-    ''', (user_id,))
-    
-    user = cursor.fetchone()
-    conn.close()
+    with storage.connection() as conn:
+        user = conn.execute(f'''
+        SELECT * FROM {TABLE_NAME}
+        WHERE {User.USER_ID} = ?
+        ''', (user_id,)).fetchone()
     
     if user:
-        return {
-            User.ID: user[0],
-            User.USER_ID: user[1],
-            User.USERNAME: user[2],
-            User.FIRST_NAME: user[3],
-            User.LAST_NAME: user[4],
-            User.LANGUAGE_CODE: user[5],
-            User.IS_ADMIN: bool(user[6]),
-            User.DATE: user[7]
-        }
+        return _row_to_user(user)
     return {}
 
 def is_admin(user_id: str) -> bool:
     """Check if the user is an admin."""
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute(f'''
-    SELECT {User.IS_ADMIN} FROM {TABLE_NAME}
-    WHERE {User.USER_ID} = ?
-    ''', (user_id,))
-    
-    result = cursor.fetchone()
-    conn.close()
-    
-    if result:
-        return bool(result[0])
-    return False
+    return _roles.get(str(user_id), False)
 
 def insert_new_user(user_id: str, username: str, first_name: str, last_name: str, language_code: str | None = None, is_admin: bool = False) -> int:
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-
     if get_user_by_id(user_id) != {}:
         log.debug(f"User {user_id} already exists in the database.")
         return UserDbCodes.USER_ALREADY_EXISTS.value
     
     try:
-        cursor.execute(f'''
-        INSERT INTO {TABLE_NAME} ({User.USER_ID}, {User.USERNAME}, {User.FIRST_NAME}, {User.LAST_NAME}, {User.LANGUAGE_CODE}, {User.IS_ADMIN})
-        VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user_id, username, first_name, last_name, language_code, int(is_admin)))
-        conn.commit()
-        conn.close()
+        with storage.connection() as conn:
+            conn.execute(f'''
+            INSERT INTO {TABLE_NAME} ({User.USER_ID}, {User.USERNAME}, {User.FIRST_NAME}, {User.LAST_NAME}, {User.LANGUAGE_CODE}, {User.IS_ADMIN})
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''', (user_id, username, first_name, last_name, language_code, int(is_admin)))
     except Exception as e:
         log.error(f"Error inserting user: {e}")
-        conn.close()
         return UserDbCodes.GENERIC_ERROR.value
     
+    # the user_id column is TEXT, callers may pass the telegram int id
+    _roles[str(user_id)] = bool(is_admin)
     return UserDbCodes.SUCCESS.value
 
 def update_user(user_id: str, username: str | None = None, first_name: str | None = None, last_name: str | None = None, language_code: str | None = None, is_admin: bool | None = None) -> dict:
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-    
     updates = []
     params = []
     
@@ -157,106 +157,62 @@ def update_user(user_id: str, username: str | None = None, first_name: str | Non
     
     params.append(user_id)
     
-    cursor.execute(f'''
-    UPDATE {TABLE_NAME}
-    SET {', '.join(updates)}
-    WHERE {User.USER_ID} = ?
-    ''', tuple(params))
-    
-    conn.commit()
-    conn.close()
+    with storage.connection() as conn:
+        conn.execute(f'''
+        UPDATE {TABLE_NAME}
+        SET {', '.join(updates)}
+        WHERE {User.USER_ID} = ?
+        ''', tuple(params))
     
-    return get_user_by_id(user_id)
+    user = get_user_by_id(user_id)
+    if user:
+        _roles[str(user_id)] = user[User.IS_ADMIN]
+    return user
 
 def set_user_admin(user_id: str, is_admin: bool) -> dict:
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute(f'''
-    UPDATE {TABLE_NAME}
-    SET {User.IS_ADMIN} = ?
-    WHERE {User.USER_ID} = ?
-    ''', (int(is_admin), user_id))
-    
-    conn.commit()
-    conn.close()
-    
-    return get_user_by_id(user_id)
+    with storage.connection() as conn:
+        conn.execute(f'''
+        UPDATE {TABLE_NAME}
+        SET {User.IS_ADMIN} = ?
+        WHERE {User.USER_ID} = ?
+        ''', (int(is_admin), user_id))
+    
+    user = get_user_by_id(user_id)
+    if user:
+        _roles[str(user_id)] = user[User.IS_ADMIN]
+    return user
 
 def delete_user(user_id: str) -> bool:
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute(f'''
-    DELETE FROM {TABLE_NAME}
-    WHERE {User.USER_ID} = ?
-    ''', (user_id,))
-    
-    conn.commit()
-    conn.close()
+    with storage.connection() as conn:
+        cursor = conn.execute(f'''
+        DELETE FROM {TABLE_NAME}
+        WHERE {User.USER_ID} = ?
+        ''', (user_id,))
     
+    _roles.pop(str(user_id), None)
     return cursor.rowcount > 0
 
 def get_all_users() -> list:
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
+    with storage.connection() as conn:
+        users = conn.execute(f'''
+        SELECT * FROM {TABLE_NAME}
+        ''').fetchall()
     
-    cursor.execute(f'''
-    SELECT * FROM {TABLE_NAME}
-    ''')
-    
-    users = cursor.fetchall()
-    conn.close()
-    
-    return [
-        {
-            User.ID: user[0],
-            User.USER_ID: user[1],
-            User.USERNAME: user[2],
-            User.FIRST_NAME: user[3],
-            User.LAST_NAME: user[4],
-            User.LANGUAGE_CODE: user[5],
-            User.IS_ADMIN: bool(user[6]),
-            User.DATE: user[7]
-        }
-        for user in users
-    ]
+    return [_row_to_user(user) for user in users]
 
 def get_admins() -> list:
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute(f'''
-    SELECT * FROM {TABLE_NAME}
-    WHERE {User.IS_ADMIN} = 1
-    ''')
+    with storage.connection() as conn:
+        admins = conn.execute(f'''
+        SELECT * FROM {TABLE_NAME}
+        WHERE {User.IS_ADMIN} = 1
+        ''').fetchall()
     
-    admins = cursor.fetchall()
-    conn.close()
-    
-    return [
-        {
-            User.ID: admin[0],
-            User.USER_ID: admin[1],
-            User.USERNAME: admin[2],
-            User.FIRST_NAME: admin[3],
-            User.LAST_NAME: admin[4],
-            User.LANGUAGE_CODE: admin[5],
-            User.IS_ADMIN: bool(admin[6]),
-            User.DATE: admin[7]
-        }
-        for admin in admins
-    ]
+    return [_row_to_user(admin) for admin in admins]
 
 def get_user_count() -> int:
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute(f'''
-    SELECT COUNT(*) FROM {TABLE_NAME}
-    ''')
-    
-    count = cursor.fetchone()[0]
-    conn.close()
+    with storage.connection() as conn:
+        count = conn.execute(f'''
+        SELECT COUNT(*) FROM {TABLE_NAME}
+        ''').fetchone()[0]
     
     return count
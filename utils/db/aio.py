@@ -0,0 +1,197 @@
+import asyncio
+import functools
+import inspect
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from types import ModuleType
+from typing import Any, Callable
+
+import utils.auth.users_db as _users_db
+import utils.commands.list_util_v2 as _list_util
+import utils.messages.dice.dice_db as _dice_db
+import utils.messages.dice.dice_util_v2 as _dice_util
+import utils.messages.dumb.mbarometro_util_v2 as _mbarometro_util
+import utils.messages.todo.todo_db as _todo_db
+import utils.media.media_db as _media_db
+from utils.db import storage
+
+log = logging.getLogger("db_worker")
+
+# Group commit: once a call has written something, keep collecting calls for
+# up to COMMIT_WINDOW_MS or COMMIT_MAX_BATCH writes before committing them together
+COMMIT_WINDOW_MS = float(os.getenv("DB_COMMIT_WINDOW_MS", "5"))
+COMMIT_MAX_BATCH = int(os.getenv("DB_COMMIT_MAX_BATCH", "64"))
+
+
+class DBWorker:
+    """
+    Dedicated thread that runs every database call, so handlers can await
+    them without blocking the event loop.
+    Calls are executed one at a time, in submission order, and consecutive
+    writes are group committed: they share a single transaction and each
+    caller's future is resolved once that transaction is committed.
+    """
+
+    def __init__(self, name: str = "db-worker", commit_window_ms: float = COMMIT_WINDOW_MS, max_batch: int = COMMIT_MAX_BATCH):
+        self.name = name
+        self.commit_window = commit_window_ms / 1000
+        self.max_batch = max_batch
+        self._queue: "queue.SimpleQueue[tuple | None]" = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+                log.debug(f"{self.name} started")
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Queue a call on the worker thread and return its future."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((future, fn, args, kwargs))
+        return future
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a call on the worker thread and await its result."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    async def drain(self):
+        """Wait until every call queued so far has been committed."""
+        if self._thread is not None:
+            await self.run(lambda: None)
+
+    def stop(self, timeout: float | None = None):
+        """Let the queued calls finish and commit, then stop the worker thread."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+        log.debug(f"{self.name} stopped")
+
+    def _execute(self, conn, job: tuple) -> tuple:
+        """Run one call inside its own savepoint, so a failing call only undoes its own writes."""
+        future, fn, args, kwargs = job
+        if not future.set_running_or_notify_cancel():
+            return None
+        conn.execute("SAVEPOINT job")
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            conn.execute("ROLLBACK TO job")
+            conn.execute("RELEASE job")
+            return future, None, e
+        conn.execute("RELEASE job")
+        return future, result, None
+
+    def _next_job(self, writes: int, deadline: float | None):
+        """Next call to add to the open batch, or the batch is done (raises queue.Empty)."""
+        if deadline is None:
+            # nothing written yet, only take what is already queued
+            return self._queue.get_nowait()
+        remaining = deadline - time.monotonic()
+        if writes >= self.max_batch or remaining <= 0:
+            raise queue.Empty
+        return self._queue.get(timeout=remaining)
+
+    def _run_batch(self, job: tuple) -> bool:
+        """Run calls in one transaction until the batch closes. Returns True when asked to stop."""
+        outcomes = []
+        running = None  # the future of the call being executed, not in outcomes yet
+        stop = False
+        writes = 0
+        deadline = None
+        try:
+            with storage.transaction() as conn:
+                while True:
+                    changes = conn.total_changes
+                    running = job[0]
+                    outcome = self._execute(conn, job)
+                    running = None
+                    if outcome is not None:
+                        outcomes.append(outcome)
+                    if conn.total_changes != changes:
+                        writes += 1
+                        if deadline is None:
+                            deadline = time.monotonic() + self.commit_window
+                    try:
+                        job = self._next_job(writes, deadline)
+                    except queue.Empty:
+                        break
+                    if job is None:
+                        stop = True
+                        break
+        except BaseException as e:
+            log.error(f"Error committing db batch: {e}")
+            for future, _, _ in outcomes:
+                future.set_exception(e)
+            # e.g. its savepoint couldn't be released because the transaction was aborted
+            if running is not None and not running.done():
+                running.set_exception(e)
+            return stop
+
+        if writes > 1:
+            log.debug(f"Committed {writes} writes in one transaction")
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        return stop
+
+    def _loop(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            if self._run_batch(job):
+                break
+
+
+worker = DBWorker()
+
+
+async def run(fn: Callable, *args, **kwargs) -> Any:
+    """Run a sync db function on the shared worker and await its result."""
+    return await worker.run(fn, *args, **kwargs)
+
+
+class AsyncModule:
+    """
+    Awaitable view of a sync db module: same function names and arguments,
+    every call is executed on the db worker. Non-function attributes
+    (enums, classes, constants) are returned untouched.
+    """
+
+    def __init__(self, module: ModuleType):
+        self._module = module
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._module, name)
+        if not inspect.isfunction(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def wrapper(*args, **kwargs):
+            return await run(attr, *args, **kwargs)
+
+        setattr(self, name, wrapper)  # cache the wrapper for the next lookup
+        return wrapper
+
+
+users_db = AsyncModule(_users_db)
+dice_db = AsyncModule(_dice_db)
+dice_util = AsyncModule(_dice_util)
+todo_db = AsyncModule(_todo_db)
+mbarometro_util = AsyncModule(_mbarometro_util)
+list_util = AsyncModule(_list_util)
+media_db = AsyncModule(_media_db)
@@ -0,0 +1,179 @@
+import os
+import queue
+import sqlite3
+import logging
+import threading
+import dotenv
+from contextlib import contextmanager
+from typing import Callable, Iterator, List
+
+log = logging.getLogger("storage")
+dotenv.load_dotenv()
+
+## DATA
+DB_FILE_PATH = os.getenv("DB_FILE_PATH", "./db.db")
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
+os.makedirs(os.path.dirname(DB_FILE_PATH) or ".", exist_ok=True)
+
+# Pragma profile applied once per connection, each value can be tuned from the env
+PRAGMAS = {
+    "journal_mode": os.getenv("DB_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("DB_SYNCHRONOUS", "NORMAL"),
+    "cache_size": int(os.getenv("DB_CACHE_SIZE", "-16000")),  # negative = KiB, ~16MB
+    "mmap_size": int(os.getenv("DB_MMAP_SIZE", str(128 * 1024 * 1024))),
+    "busy_timeout": int(os.getenv("DB_BUSY_TIMEOUT", "5000")),  # ms
+    "foreign_keys": "ON",
+}
+
+_local = threading.local()  # holds the batch connection of the current thread, if any
+_pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=POOL_SIZE)
+_opened = 0
+_pool_lock = threading.Lock()
+# called after a transaction() batch is rolled back, see on_rollback
+_rollback_hooks: List[Callable[[], None]] = []
+
+
+def _open() -> sqlite3.Connection:
+    """Open a new connection and apply the pragma profile."""
+    conn = sqlite3.connect(
+        DB_FILE_PATH,
+        timeout=PRAGMAS["busy_timeout"] / 1000,
+        check_same_thread=False,  # connections move between threads through the pool
+        isolation_level=None,  # transactions are handled explicitly by connection()
+    )
+    for pragma, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    log.debug(f"Opened connection to {DB_FILE_PATH} with {PRAGMAS}")
+    return conn
+
+
+def _acquire() -> sqlite3.Connection:
+    global _opened
+    try:
+        return _pool.get_nowait()
+    except queue.Empty:
+        pass
+    with _pool_lock:
+        if _opened < POOL_SIZE:
+            _opened += 1
+            try:
+                return _open()
+            except Exception:
+                _opened -= 1
+                raise
+    # pool exhausted, wait for a connection to be released
+    return _pool.get()
+
+
+def _release(conn: sqlite3.Connection):
+    if conn.in_transaction:
+        _discard(conn)
+        return
+    _pool.put_nowait(conn)
+
+
+def _discard(conn: sqlite3.Connection):
+    """Replace a connection left with an open transaction, it can't be handed out again."""
+    global _opened
+    log.error("Discarding a connection with a transaction still open")
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+    try:
+        _pool.put_nowait(_open())
+    except Exception as e:
+        log.error(f"Error reopening a connection: {e}")
+        with _pool_lock:
+            _opened -= 1
+
+
+def _rollback(conn: sqlite3.Connection):
+    try:
+        conn.rollback()
+    except sqlite3.Error as e:
+        # the connection is discarded by _release, the original error is raised
+        log.error(f"Error rolling back: {e}")
+
+
+@contextmanager
+def connection() -> Iterator[sqlite3.Connection]:
+    """
+    Borrow a pooled connection wrapped in a transaction.
+    The transaction is committed when the block exits and rolled back if it
+    raises or if the commit fails.
+    Inside a transaction() block the batch connection is reused and the
+    commit is left to the batch.
+    """
+    batch_conn = getattr(_local, "conn", None)
+    if batch_conn is not None:
+        yield batch_conn
+        return
+
+    conn = _acquire()
+    try:
+        conn.execute("BEGIN")
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            _rollback(conn)
+            raise
+    finally:
+        _release(conn)
+
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    """
+    Open a transaction that every connection() call made from this thread joins,
+    so several writes share a single commit.
+    """
+    conn = _acquire()
+    _local.conn = conn
+    rolled_back = False
+    try:
+        conn.execute("BEGIN")
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            _rollback(conn)
+            rolled_back = True
+            raise
+    finally:
+        _local.conn = None
+        _release(conn)
+        if rolled_back:
+            _run_rollback_hooks()
+
+
+def on_rollback(hook: Callable[[], None]) -> Callable[[], None]:
+    """
+    Register a function to call when a transaction() batch is rolled back,
+    e.g. because its commit failed. The in-memory state changed by the calls
+    of the batch doesn't match the db anymore: the hook drops or reloads it.
+    """
+    _rollback_hooks.append(hook)
+    return hook
+
+
+def _run_rollback_hooks():
+    for hook in _rollback_hooks:
+        try:
+            hook()
+        except Exception as e:
+            log.error(f"Error in rollback hook {hook.__qualname__}: {e}")
+
+
+def close_all():
+    """Close every idle pooled connection."""
+    global _opened
+    while True:
+        try:
+            conn = _pool.get_nowait()
+        except queue.Empty:
+            break
+        conn.close()
+        with _pool_lock:
+            _opened -= 1
@@ -1,18 +1,10 @@
 # escape protected chars
-import logging
+from utils.markdown import escape_protected
 
-log = logging.getLogger("escape")
 
 def escape_protected_chars(text: str) -> str:
     """
     Escape special characters in a string for MarkdownV2.
+    Bold, italic and code formatting are kept, see utils.markdown for the rest.
     """
-    log.debug(f"Original text: {text}")
-    # Define the characters to escape
-    protected_chars = [ "[", "]", "(", ")", "~", ">", "#", "+", "-", "=", "|", "{", "}", ".", "!"]
-    # Escape each character in the string
-    for char in protected_chars:
-        text = text.replace(char, f"\\{char}")
-    
-    log.debug(f"Escaped text: {text}")
-    return text
+    return escape_protected(text)
@@ -0,0 +1,111 @@
+# MarkdownV2 rendering: escaping, templates and long messages
+import textwrap
+from typing import Callable, List, Optional
+
+from telegram.constants import MessageLimit
+
+MAX_MESSAGE_LENGTH = MessageLimit.MAX_TEXT_LENGTH  # 4096
+
+# every character with a meaning in MarkdownV2, the backslash first
+_ESCAPE_ALL = tuple((char, f"\\{char}") for char in "\\_*[]()~`>#+-=|{}.!")
+# all of them except the formatting ones (*, _, `), for texts that use formatting
+_ESCAPE_PROTECTED = tuple((char, f"\\{char}") for char in "[]()~>#+-=|{}.!")
+
+
+def _escape(text: str, table) -> str:
+    # one str.replace per character is faster than str.translate, whose
+    # one-to-two characters mapping is off the fast path of CPython
+    for char, escaped in table:
+        text = text.replace(char, escaped)
+    return text
+
+
+def escape(text: str) -> str:
+    """Escape a plain text for MarkdownV2."""
+    return _escape(str(text), _ESCAPE_ALL)
+
+
+def escape_protected(text: str) -> str:
+    """Escape a text for MarkdownV2 but keep its bold, italic and code formatting."""
+    return _escape(str(text), _ESCAPE_PROTECTED)
+
+
+class Template:
+    """
+    A message template, dedented once when created.
+    render() fills the {placeholders} with the values escaped by `escape`,
+    or untouched if escape is None.
+    """
+
+    def __init__(self, template: str, escape: Optional[Callable[[str], str]] = escape):
+        self.template = textwrap.dedent(template)
+        self.escape = escape
+
+    def render(self, **values) -> str:
+        if self.escape is not None:
+            values = {name: self.escape(value) for name, value in values.items()}
+        return self.template.format_map(values)
+
+
+class MessageBuilder:
+    """
+    Collect the parts of a long message and join them once, instead of
+    growing a string. Each part is kept whole when the message is split.
+    """
+
+    def __init__(self):
+        self._parts: List[str] = []
+
+    def add(self, markdown: str) -> "MessageBuilder":
+        """Add MarkdownV2 as is."""
+        self._parts.append(markdown)
+        return self
+
+    def text(self, text: str) -> "MessageBuilder":
+        """Add plain text, escaped."""
+        self._parts.append(escape(text))
+        return self
+
+    def build(self) -> str:
+        return "".join(self._parts)
+
+    def split(self, limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+        """The message in chunks of at most `limit` characters."""
+        chunks = []
+        chunk: List[str] = []
+        length = 0
+        for part in self._parts:
+            if length + len(part) > limit and chunk:
+                chunks.append("".join(chunk))
+                chunk, length = [], 0
+            if len(part) > limit:
+                chunks.extend(split_message(part, limit))
+                continue
+            chunk.append(part)
+            length += len(part)
+        if chunk:
+            chunks.append("".join(chunk))
+        return chunks
+
+
+def split_message(text: str, limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    """
+    Split a MarkdownV2 text in chunks of at most `limit` characters,
+    at the last newline of each chunk when there is one, never after an escaping backslash.
+    """
+    chunks = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit) + 1
+        if cut <= 0:
+            cut = limit
+            # don't separate a backslash from the character it escapes
+            backslashes = 0
+            while backslashes < cut and text[cut - 1 - backslashes] == "\\":
+                backslashes += 1
+            if backslashes % 2:
+                cut -= 1
+        chunks.append(text[:cut])
+        text = text[cut:]
+    if text:
+        chunks.append(text)
+    return chunks
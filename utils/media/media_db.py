@@ -0,0 +1,89 @@
+import os
+import hashlib
+import logging
+from enum import StrEnum
+from typing import Dict, Optional, Tuple
+from utils.db import storage
+
+log = logging.getLogger("media_db")
+
+## DATA
+TABLE_NAME = 'media_files'
+
+class Media(StrEnum):
+    PATH = 'path'
+    CONTENT_HASH = 'content_hash'
+    MEDIA_TYPE = 'media_type'
+    FILE_ID = 'file_id'
+    DATE = 'insert_date'
+
+#init db on module import
+def init_db():
+    with storage.connection() as conn:
+        conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+            {Media.PATH} TEXT NOT NULL,
+            {Media.CONTENT_HASH} TEXT NOT NULL,
+            {Media.MEDIA_TYPE} TEXT NOT NULL,
+            {Media.FILE_ID} TEXT NOT NULL,
+            {Media.DATE} DATE DEFAULT (datetime('now', 'localtime') ),
+            PRIMARY KEY ({Media.PATH}, {Media.CONTENT_HASH})
+        )
+        ''')
+
+init_db()
+
+# path -> (mtime, size, sha256), so a file is only hashed again when it changes
+_hashes: Dict[str, Tuple[int, int, str]] = {}
+# (path, sha256) -> file_id
+_file_ids: Dict[Tuple[str, str], str] = {}
+
+def content_hash(path: str) -> str:
+    stat = os.stat(path)
+    cached = _hashes.get(path)
+    if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+    with open(path, 'rb') as file:
+        digest = hashlib.file_digest(file, 'sha256').hexdigest()
+    _hashes[path] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+## DB ACCESS
+def get_file_id(path: str) -> Tuple[str, Optional[str]]:
+    """
+    Get the telegram file_id of the current content of the file.
+    Returns the content hash and the file_id, None if the file was never uploaded.
+    """
+    path = str(path)
+    digest = content_hash(path)
+    file_id = _file_ids.get((path, digest))
+    if file_id is None:
+        with storage.connection() as conn:
+            row = conn.execute(f'''
+            SELECT {Media.FILE_ID} FROM {TABLE_NAME}
+            WHERE {Media.PATH} = ? AND {Media.CONTENT_HASH} = ?
+            ''', (path, digest)).fetchone()
+        if row:
+            file_id = _file_ids[(path, digest)] = row[0]
+    return digest, file_id
+
+def set_file_id(path: str, digest: str, media_type: str, file_id: str):
+    """Store the file_id telegram assigned to an upload of the file."""
+    path = str(path)
+    with storage.connection() as conn:
+        conn.execute(f'''
+        INSERT INTO {TABLE_NAME} ({Media.PATH}, {Media.CONTENT_HASH}, {Media.MEDIA_TYPE}, {Media.FILE_ID})
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT({Media.PATH}, {Media.CONTENT_HASH}) DO UPDATE SET {Media.FILE_ID} = excluded.{Media.FILE_ID}
+        ''', (path, digest, media_type, file_id))
+    _file_ids[(path, digest)] = file_id
+
+def delete_file_id(path: str, digest: str):
+    """Forget a file_id telegram doesn't accept anymore."""
+    path = str(path)
+    with storage.connection() as conn:
+        conn.execute(f'''
+        DELETE FROM {TABLE_NAME}
+        WHERE {Media.PATH} = ? AND {Media.CONTENT_HASH} = ?
+        ''', (path, digest))
+    _file_ids.pop((path, digest), None)
@@ -0,0 +1,47 @@
+import logging
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+from telegram import Message
+from telegram.error import BadRequest
+
+from utils.db.aio import media_db
+
+log = logging.getLogger("media")
+
+
+def _file_id_of(message: Message, media_type: str) -> Optional[str]:
+    """The file_id telegram assigned to the media of a sent message."""
+    media = getattr(message, media_type, None)
+    if media_type == "photo" and media:
+        media = media[-1]  # biggest size
+    return getattr(media, "file_id", None)
+
+
+async def send_cached_media(
+    send_method: Callable,
+    media_type: str,
+    path: Union[str, Path],
+    **kwargs,
+) -> Message:
+    """
+    Send a local file with send_method (e.g. message.reply_photo).
+    The file is uploaded only the first time: the file_id telegram returns is
+    stored and reused for the next sends, until telegram rejects it.
+    """
+    path = str(path)
+    digest, file_id = await media_db.get_file_id(path)
+    if file_id:
+        try:
+            return await send_method(**{media_type: file_id}, **kwargs)
+        except BadRequest as e:
+            log.warning(f"Cached file_id of {path} rejected, uploading again: {e}")
+            await media_db.delete_file_id(path, digest)
+
+    with open(path, "rb") as file:
+        message = await send_method(**{media_type: file}, **kwargs)
+
+    file_id = _file_id_of(message, media_type)
+    if file_id:
+        await media_db.set_file_id(path, digest, media_type, file_id)
+    return message
@@ -1,17 +1,14 @@
-import sqlite3
-import os
-from typing import List
-import dotenv
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
 from datetime import date
 from var.messages.dice.slot import Game
+from utils.db import storage
 import logging
 from enum import StrEnum
 
 log = logging.getLogger("dice_db")
-dotenv.load_dotenv()
 
 ## DATA
-DB_FILE_PATH = os.getenv('DB_FILE_PATH', './db.db')
 TABLE_NAME = 'dice'
 
 class Entry(StrEnum):
@@ -21,93 +18,116 @@ class Entry(StrEnum):
     GAME = 'game'
     ATTEMPT = 'attempt'
     WON = 'won'
+    MONTH = 'month'  # generated 'YYYY-MM' key, indexed for the monthly queries
 
-os.makedirs(os.path.dirname(DB_FILE_PATH), exist_ok=True)
+MONTH_EXPRESSION = f"substr({Entry.DATE}, 1, 7)"
 
 #init db on module import
 def init_db():
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute(f'''
-    CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
-        {Entry.ID} INTEGER PRIMARY KEY AUTOINCREMENT,
-        {Entry.USER_ID} TEXT NOT NULL,
-        {Entry.DATE} DATE NOT NULL,
-        {Entry.GAME} TEXT NOT NULL,
-        {Entry.ATTEMPT} TEXT NOT NULL,
-        {Entry.WON} INTEGER NOT NULL
-    )
+    with storage.connection() as conn:
+        conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+            {Entry.ID} INTEGER PRIMARY KEY AUTOINCREMENT,
+            {Entry.USER_ID} TEXT NOT NULL,
+            {Entry.DATE} DATE NOT NULL,
+            {Entry.GAME} TEXT NOT NULL,
+            {Entry.ATTEMPT} TEXT NOT NULL,
+            {Entry.WON} INTEGER NOT NULL,
+            {Entry.MONTH} TEXT GENERATED ALWAYS AS ({MONTH_EXPRESSION}) VIRTUAL
+        )
+        ''')
+        _migrate(conn)
+
+def _migrate(conn):
+    """Bring tables created before the month key and the indexes up to date."""
+    columns = [column[1] for column in conn.execute(f"PRAGMA table_xinfo({TABLE_NAME})")]
+    if Entry.MONTH not in columns:
+        log.info(f"Adding {Entry.MONTH} column to {TABLE_NAME}")
+        conn.execute(f'''
+        ALTER TABLE {TABLE_NAME}
+        ADD COLUMN {Entry.MONTH} TEXT GENERATED ALWAYS AS ({MONTH_EXPRESSION}) VIRTUAL
+        ''')
+
+    # daily checks: one user's attempts of the day, covering so the table is never touched
+    conn.execute(f'''
+    CREATE INDEX IF NOT EXISTS idx_{TABLE_NAME}_user_day
+    ON {TABLE_NAME} ({Entry.USER_ID}, {Entry.DATE}, {Entry.GAME}, {Entry.ATTEMPT})
+    ''')
+    # monthly leaderboard and players
+    conn.execute(f'''
+    CREATE INDEX IF NOT EXISTS idx_{TABLE_NAME}_month
+    ON {TABLE_NAME} ({Entry.MONTH}, {Entry.USER_ID}, {Entry.WON})
     ''')
-    
-    conn.commit()
-    conn.close()
 
 init_db()
 
+@dataclass
+class DailyState:
+    """Everything a user played today: the attempts of each game, in order."""
+    day: str
+    attempts: Dict[str, List[int]] = field(default_factory=dict)
+
+    def game_attempts(self, game: Game) -> List[int]:
+        return self.attempts.get(game, [])
+
+    @property
+    def games_count(self) -> int:
+        return len(self.attempts)
+
+# (user, day) -> DailyState, kept current by add_daily_game_attempt
+_daily_states: Dict[Tuple[str, str], DailyState] = {}
+storage.on_rollback(_daily_states.clear)
+
+def _month_key(month: int, year: int) -> str:
+    return f"{year}-{month:02}"
+
+def _today() -> str:
+    # dates are stored as ISO strings, which is what the month key is computed from
+    return date.today().isoformat()
+
 ## DB ACCESS
 def get_monthly_wins(user: str, month: int, year: int) -> int:
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute(f'''
-    SELECT COUNT(*) FROM {TABLE_NAME}
-    WHERE {Entry.USER_ID} = ? 
-    AND strftime('%Y-%m', {Entry.DATE}) = ? 
-    AND {Entry.WON} = 1
-    ''', (user, f"{year}-{month:02}"))
-    
-    wins = cursor.fetchone()[0]
-    conn.close()
+    with storage.connection() as conn:
+        wins = conn.execute(f'''
+        SELECT COUNT(*) FROM {TABLE_NAME}
+        WHERE {Entry.MONTH} = ?
+        AND {Entry.WON} = 1
+        AND {Entry.USER_ID} = ?
+        ''', (_month_key(month, year), user)).fetchone()[0]
     
     return wins
 
 def get_all_monthly_wins(month: int, year: int) -> dict:
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute(f'''
-    SELECT {Entry.USER_ID}, COUNT(*) FROM {TABLE_NAME}
-    WHERE strftime('%Y-%m', {Entry.DATE}) = ? AND {Entry.WON} = 1
-    GROUP BY {Entry.USER_ID}
-    ''', (f"{year}-{month:02}",))
-    
-    wins = {user: count for user, count in cursor.fetchall()}
-    conn.close()
-    
-    return wins
+    with storage.connection() as conn:
+        rows = conn.execute(f'''
+        SELECT {Entry.USER_ID}, COUNT(*) FROM {TABLE_NAME}
+        WHERE {Entry.MONTH} = ? AND {Entry.WON} = 1
+        GROUP BY {Entry.USER_ID}
+        ''', (_month_key(month, year),)).fetchall()
+    
+    return {user: count for user, count in rows}
 
 def get_all_monthly_players(month: int, year: int) -> List[str]:
     """
     Get all players who have played in the given month and year.
     """
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute(f'''
-    SELECT DISTINCT {Entry.USER_ID} FROM {TABLE_NAME}
-    WHERE strftime('%Y-%m', {Entry.DATE}) = ?
-    ''', (f"{year}-{month:02}",))
+    with storage.connection() as conn:
+        rows = conn.execute(f'''
+        SELECT DISTINCT {Entry.USER_ID} FROM {TABLE_NAME}
+        WHERE {Entry.MONTH} = ?
+        ''', (_month_key(month, year),)).fetchall()
     
-    players = [user[0] for user in cursor.fetchall()]
-    conn.close()
-    
-    return players
+    return [user[0] for user in rows]
 
 def get_daily_attempts_count(user: str, game: Game) -> int:
     """
     Get the number of attempts the user has made today for the given game.
     """
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute(f'''
-    SELECT COUNT(*) FROM {TABLE_NAME}
-    WHERE {Entry.USER_ID} = ? AND {Entry.DATE} = ? AND {Entry.GAME} = ?
-    ''', (user, date.today(), game))
-    
-    count = cursor.fetchone()[0]
-    conn.close()
+    with storage.connection() as conn:
+        count = conn.execute(f'''
+        SELECT COUNT(*) FROM {TABLE_NAME}
+        WHERE {Entry.USER_ID} = ? AND {Entry.DATE} = ? AND {Entry.GAME} = ?
+        ''', (user, _today(), game)).fetchone()[0]
     
     return count
 
@@ -115,16 +135,11 @@ def get_daily_games_count(user: str) -> int:
     """
     Get the number of distinct games the user has played today.
     """
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute(f'''
-    SELECT COUNT(DISTINCT {Entry.GAME}) FROM {TABLE_NAME}
-    WHERE {Entry.USER_ID} = ? AND {Entry.DATE} = ?
-    ''', (user, date.today()))
-    
-    count = cursor.fetchone()[0]
-    conn.close()
+    with storage.connection() as conn:
+        count = conn.execute(f'''
+        SELECT COUNT(DISTINCT {Entry.GAME}) FROM {TABLE_NAME}
+        WHERE {Entry.USER_ID} = ? AND {Entry.DATE} = ?
+        ''', (user, _today())).fetchone()[0]
     
     return count
 
@@ -132,32 +147,55 @@ def get_daily_attempts(user: str, game: Game) -> List[int]:
     """
     Get the user's attempts for the given game today.
     """
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute(f'''
-    SELECT {Entry.ATTEMPT} FROM {TABLE_NAME}
-    WHERE {Entry.USER_ID} = ? AND {Entry.DATE} = ? AND {Entry.GAME} = ?
-    ''', (user, date.today(), game))
+    with storage.connection() as conn:
+        rows = conn.execute(f'''
+        SELECT {Entry.ATTEMPT} FROM {TABLE_NAME}
+        WHERE {Entry.USER_ID} = ? AND {Entry.DATE} = ? AND {Entry.GAME} = ?
+        ''', (user, _today(), game)).fetchall()
 
-    attempts = [int(attempt[0]) for attempt in cursor.fetchall()]
-    conn.close()
+    return [int(attempt[0]) for attempt in rows]
 
-    return attempts
+def get_daily_state(user: str) -> DailyState:
+    """
+    Get everything the user played today.
+    Loaded with a single query the first time and then served from memory.
+    """
+    today = _today()
+    state = _daily_states.get((user, today))
+    if state is not None:
+        return state
+
+    # drop the states of the previous days
+    for key in [key for key in _daily_states if key[1] != today]:
+        del _daily_states[key]
+
+    with storage.connection() as conn:
+        rows = conn.execute(f'''
+        SELECT {Entry.GAME}, {Entry.ATTEMPT} FROM {TABLE_NAME}
+        WHERE {Entry.USER_ID} = ? AND {Entry.DATE} = ?
+        ORDER BY {Entry.ID}
+        ''', (user, today)).fetchall()
+
+    state = DailyState(day=today)
+    for game, attempt in rows:
+        state.attempts.setdefault(game, []).append(int(attempt))
+    _daily_states[(user, today)] = state
+    return state
 
 def add_daily_game_attempt(user: str, game: Game, attempt: str, won: bool):
     """
     Add a new game attempt to the database.
     Each attempt is stored as a separate row.
     """
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-    
-    # Simply insert a new row for the attempt
-    cursor.execute(f'''
-    INSERT INTO {TABLE_NAME} ({Entry.USER_ID}, {Entry.DATE}, {Entry.GAME}, {Entry.ATTEMPT}, {Entry.WON})
-    VALUES (?, ?, ?, ?, ?)
-    ''', (user, date.today(), game, attempt, 1 if won else 0))
-    
-    conn.commit()
-    conn.close()
+    today = _today()
+    with storage.connection() as conn:
+        # Simply insert a new row for the attempt
+        conn.execute(f'''
+        INSERT INTO {TABLE_NAME} ({Entry.USER_ID}, {Entry.DATE}, {Entry.GAME}, {Entry.ATTEMPT}, {Entry.WON})
+        VALUES (?, ?, ?, ?, ?)
+        ''', (user, today, game, attempt, 1 if won else 0))
+
+    # write-through, so the next attempt doesn't need to hit the table
+    state = _daily_states.get((user, today))
+    if state is not None:
+        state.attempts.setdefault(game, []).append(int(attempt))
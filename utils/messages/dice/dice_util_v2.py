@@ -1,13 +1,10 @@
 import logging
 from .dice_db import (
-    get_all_monthly_players,
     get_monthly_wins, 
-    get_all_monthly_wins, 
-    get_daily_attempts_count, 
     add_daily_game_attempt, 
-    get_daily_games_count, 
-    get_daily_attempts
+    get_daily_state
 )
+from .leaderboard import leaderboard
 from var.messages.dice.slot import Game, RESULT_CODES, MAX_GAMES_PER_DAY, MAX_MONTHLY_WINS, slot_machine_values
 from datetime import date
 from typing import List, Tuple
@@ -26,14 +23,15 @@ def handle_attempt(
     if max_daily_attempts < needed_attempts:
         max_daily_attempts = needed_attempts
 
-    attempts = get_daily_attempts(user, game)
+    state = get_daily_state(user)
+    attempts = list(state.game_attempts(game))
     log.debug(f"User {user} attempts for game {game}: {attempts}")
     # Check if the user has already played the game more than the allowed times for that game
-    if get_daily_attempts_count(user, game) >= max_daily_attempts:
+    if len(attempts) >= max_daily_attempts:
         return False, RESULT_CODES.ALREADY_PLAYED
     
     # Check if the user has already played MAX_GAMES_PER_DAY games
-    daily_games_count = get_daily_games_count(user)
+    daily_games_count = state.games_count
     log.debug(f"User {user} total daily games count: {daily_games_count}")
     
     if daily_games_count >= MAX_GAMES_PER_DAY:
@@ -51,6 +49,7 @@ def handle_attempt(
     attempts.append(value)
     won, code = actual_handler(attempts, max_daily_attempts)
     add_daily_game_attempt(user, game, str(value), won)
+    leaderboard.record(user, won)
 
     return won, code
 
@@ -181,7 +180,13 @@ def check_monthly_wins(user: str) -> int:
     return get_monthly_wins(user, date.today().month, date.today().year)
 
 def check_all_monthly_wins() -> dict:
-    return get_all_monthly_wins(date.today().month, date.today().year)
+    return leaderboard.wins()
+
+def get_monthly_ranking() -> List[Tuple[str, int]]:
+    return leaderboard.ranking()
 
 def get_monthly_players() -> List[str]:
-    return get_all_monthly_players(date.today().month, date.today().year)
+    return leaderboard.players()
+
+def rebuild_monthly_leaderboard():
+    leaderboard.rebuild()
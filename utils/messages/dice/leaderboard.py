@@ -0,0 +1,72 @@
+import logging
+from datetime import date
+from typing import Dict, List, Tuple
+
+from utils.db import storage
+from .dice_db import get_all_monthly_players, get_all_monthly_wins
+
+log = logging.getLogger("dice")
+
+
+class MonthlyLeaderboard:
+    """
+    In-memory read model of the current month: wins per user and the players.
+    Rebuilt from the dice table on first use and when the month changes,
+    then kept up to date by record() on every attempt.
+    """
+
+    def __init__(self):
+        self.month: Tuple[int, int] | None = None
+        self._wins: Dict[str, int] = {}
+        self._players: Dict[str, None] = {}  # insertion ordered set
+        self._ranking: List[Tuple[str, int]] | None = None
+
+    def rebuild(self):
+        """Reload the current month from the dice table."""
+        today = date.today()
+        self.month = (today.year, today.month)
+        self._wins = get_all_monthly_wins(today.month, today.year)
+        self._players = dict.fromkeys(get_all_monthly_players(today.month, today.year))
+        self._ranking = None
+        log.debug(f"Leaderboard rebuilt for {today.month}/{today.year}: {len(self._players)} players")
+
+    def invalidate(self):
+        """Rebuild from the dice table on the next use."""
+        self.month = None
+
+    def _ensure_current_month(self) -> bool:
+        """Rebuild if the month changed, True if it did."""
+        today = date.today()
+        if self.month != (today.year, today.month):
+            self.rebuild()
+            return True
+        return False
+
+    def record(self, user: str, won: bool):
+        """Account for a recorded attempt of today, called after it was inserted."""
+        if self._ensure_current_month():
+            # the rebuild read the attempt from the dice table already
+            return
+        self._players.setdefault(user)
+        if won:
+            self._wins[user] = self._wins.get(user, 0) + 1
+            self._ranking = None
+
+    def wins(self) -> Dict[str, int]:
+        self._ensure_current_month()
+        return dict(self._wins)
+
+    def players(self) -> List[str]:
+        self._ensure_current_month()
+        return list(self._players)
+
+    def ranking(self) -> List[Tuple[str, int]]:
+        """Users sorted by wins, highest first. Only re-sorted after a win."""
+        self._ensure_current_month()
+        if self._ranking is None:
+            self._ranking = sorted(self._wins.items(), key=lambda x: x[1], reverse=True)
+        return self._ranking
+
+
+leaderboard = MonthlyLeaderboard()
+storage.on_rollback(leaderboard.invalidate)
@@ -0,0 +1,86 @@
+from collections import deque
+from typing import Any, Dict, Iterator, List, Tuple
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over literal keywords: finds every occurrence of
+    every keyword in a single pass, so the cost only depends on the text length
+    and not on how many keywords there are.
+    Matching is case-insensitive, keywords added with whole_word=True only
+    match when they are not surrounded by other word characters.
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # per state: (keyword length, whole_word, value) of the keywords ending there
+        self._keywords: List[List[Tuple[int, bool, Any]]] = [[]]
+        # per state: its keywords and those of its failure chain, computed by build()
+        self._outputs: List[List[Tuple[int, bool, Any]]] = [[]]
+        self._built = True
+
+    def __len__(self) -> int:
+        return sum(len(keywords) for keywords in self._keywords)
+
+    def add(self, keyword: str, value: Any, whole_word: bool = False):
+        if not keyword:
+            raise ValueError("Empty keyword")
+        keyword = keyword.lower()
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._keywords.append([])
+                self._goto[state][char] = next_state
+            state = next_state
+        self._keywords[state].append((len(keyword), whole_word, value))
+        self._built = False
+
+    def build(self):
+        """Compute the failure links and the outputs, breadth first. Can be called again after add()."""
+        self._outputs = [list(keywords) for keywords in self._keywords]
+        queue = deque(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                # the failure state is shallower, its outputs are already complete
+                self._outputs[next_state] = self._keywords[next_state] + self._outputs[self._fail[next_state]]
+        self._built = True
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """Yield (start, end, value) for every keyword occurrence, ordered by end position."""
+        if not self._built:
+            self.build()
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # a few characters change length when lowered, keep spans aligned with the text
+            lowered = "".join(char if len(char.lower()) != 1 else char.lower() for char in text)
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        state = 0
+        for end, char in enumerate(lowered, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, whole_word, value in outputs[state]:
+                start = end - length
+                if whole_word and (
+                    (start > 0 and _is_word_char(text[start - 1]))
+                    or (end < len(text) and _is_word_char(text[end]))
+                ):
+                    continue
+                yield start, end, value
@@ -1,29 +1,86 @@
-import dotenv
-import os
-import sqlite3
 import logging
+from utils.db import storage
 
 log = logging.getLogger("dumb")
-dotenv.load_dotenv()
-DB_FILE_PATH = os.getenv("DB_FILE_PATH", "./mbarometro.db")
-# Ensure the directory exists
-os.makedirs(os.path.dirname(DB_FILE_PATH), exist_ok=True)
 
 
 def _init_db():
     """Initialize the database with required tables if they don't exist."""
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-    cursor.execute(
+    with storage.connection() as conn:
+        conn.execute(
+            """
+        CREATE TABLE IF NOT EXISTS mbarometro (
+            user TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
         """
-    CREATE TABLE IF NOT EXISTS mbarometro (
-        user TEXT PRIMARY KEY,
-        value INTEGER NOT NULL DEFAULT 0
-    )
+        )
+
+
+class Mbarometro:
+    """
+    Per-user counters and their running total kept in memory, loaded once.
+    Each increment is a single upsert returning the new value. The writes
+    of a burst of messages share one commit thanks to the db worker's group commit.
+    The ranking is only reordered when a user overtakes the one above.
     """
-    )
-    conn.commit()
-    conn.close()
+
+    def __init__(self):
+        self._values: dict[str, int] = {}
+        self._ranking: list[str] = []  # users, highest value first
+        self.total = 0
+        self._loaded = False
+
+    def _load(self):
+        _init_db()
+        with storage.connection() as conn:
+            rows = conn.execute(
+                "SELECT user, value FROM mbarometro ORDER BY value DESC"
+            ).fetchall()
+        self._values = dict(rows)
+        self._ranking = [user for user, _ in rows]
+        self.total = sum(self._values.values())
+        self._loaded = True
+
+    def _move_up(self, user: str):
+        """Move the user up the ranking while they have more than the one above."""
+        position = self._ranking.index(user)
+        value = self._values[user]
+        while position > 0 and self._values[self._ranking[position - 1]] < value:
+            self._ranking[position - 1], self._ranking[position] = user, self._ranking[position - 1]
+            position -= 1
+
+    def increment(self, user: str, amount: int = 1) -> tuple[int, int]:
+        if not self._loaded:
+            self._load()
+        with storage.connection() as conn:
+            user_value = conn.execute(
+                "INSERT INTO mbarometro (user, value) VALUES (?, ?) "
+                "ON CONFLICT(user) DO UPDATE SET value = value + excluded.value "
+                "RETURNING value",
+                (user, amount),
+            ).fetchone()[0]
+
+        if user not in self._values:
+            self._ranking.append(user)
+        # the returned value also accounts for writes made by other processes
+        self.total += user_value - self._values.get(user, 0)
+        self._values[user] = user_value
+        self._move_up(user)
+        return user_value, self.total
+
+    def invalidate(self):
+        """Reload from the db on the next use."""
+        self._loaded = False
+
+    def get_all(self) -> list[dict]:
+        if not self._loaded:
+            self._load()
+        return [{"user": user, "value": self._values[user]} for user in self._ranking]
+
+
+mbarometro = Mbarometro()
+storage.on_rollback(mbarometro.invalidate)
 
 
 def increment(user: str, amount: int = 1):
@@ -36,29 +93,7 @@ def increment(user: str, amount: int = 1):
         tuple: (user_value, total_value) - The new user value and total across all users.
     """
     try:
-        _init_db()
-        conn = sqlite3.connect(DB_FILE_PATH)
-        cursor = conn.cursor()
-
-        # Insert or update the user's value
-        cursor.execute(
-            "INSERT INTO mbarometro (user, value) VALUES (?, ?) "
-            "ON CONFLICT(user) DO UPDATE SET value = value + ?",
-            (user, amount, amount),
-        )
-        conn.commit()
-
-        # Get the user's new value
-        cursor.execute("SELECT value FROM mbarometro WHERE user = ?", (user,))
-        user_value = cursor.fetchone()[0]
-
-        # Get the total value
-        cursor.execute("SELECT SUM(value) FROM mbarometro")
-        total = cursor.fetchone()[0] or 0
-
-        conn.close()
-        return user_value, total
-
+        return mbarometro.increment(user, amount)
     except Exception as e:
         log.error(e)
         return 0, 0
@@ -67,13 +102,7 @@ def increment(user: str, amount: int = 1):
 def get_all():
     """Retrieve all users and their values from the database as a list of dictionaries."""
     try:
-        _init_db()
-        conn = sqlite3.connect(DB_FILE_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT user, value FROM mbarometro ORDER BY value DESC")
-        rows = cursor.fetchall()
-        conn.close()
-        return [{"user": row[0], "value": row[1]} for row in rows]
+        return mbarometro.get_all()
     except Exception as e:
         log.error(e)
         return []
@@ -0,0 +1,97 @@
+import re
+import logging
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from telegram import Message
+from telegram.ext.filters import MessageFilter
+
+from .keyword_automaton import KeywordAutomaton
+
+log = logging.getLogger("dumb")
+
+# flags that can be scoped to a single group with the (?flags:...) syntax
+_SCOPED_FLAGS = {re.IGNORECASE: "i", re.MULTILINE: "m", re.DOTALL: "s", re.VERBOSE: "x"}
+# plain words separated by "|", without any other regex metacharacter
+_LITERAL_ALTERNATION = re.compile(r"[^\\.^$*+?{}\[\]()|]+(?:\|[^\\.^$*+?{}\[\]()|]+)*")
+
+
+@dataclass(frozen=True)
+class TriggerHit:
+    handler: Callable
+    text: str
+    span: Tuple[int, int]
+
+
+class TriggerEngine:
+    """
+    Find every trigger of a message in a single pass.
+    Case-insensitive alternations of plain words (e.g. "cazzo|minchia") go into
+    a KeywordAutomaton, so their cost doesn't grow with the vocabulary.
+    Real regex patterns (e.g. "^[eE]{2,}") are compiled into one alternation
+    used as fallback.
+    Each trigger is reported at most once, at its first match.
+    """
+
+    def __init__(self, mapping: Dict[re.Pattern, Callable], whole_words: bool = False):
+        self._handlers: List[Callable] = list(mapping.values())
+        self._automaton = KeywordAutomaton()
+        groups = []
+        for index, pattern in enumerate(mapping):
+            if self._is_literal(pattern):
+                for word in pattern.pattern.split("|"):
+                    self._automaton.add(word, index, whole_word=whole_words)
+            else:
+                groups.append(f"(?P<t{index}>{self._scoped(pattern)})")
+        self._automaton.build()
+        self._regex_count = len(groups)
+        self._regex = re.compile("|".join(groups)) if groups else None
+        log.debug(f"Trigger engine: {len(self._automaton)} keywords, {self._regex_count} regex patterns")
+
+    @staticmethod
+    def _is_literal(pattern: re.Pattern) -> bool:
+        return (
+            bool(pattern.flags & re.IGNORECASE)
+            and not pattern.flags & re.VERBOSE
+            and _LITERAL_ALTERNATION.fullmatch(pattern.pattern) is not None
+        )
+
+    @staticmethod
+    def _scoped(pattern: re.Pattern) -> str:
+        flags = "".join(letter for flag, letter in _SCOPED_FLAGS.items() if pattern.flags & flag)
+        return f"(?{flags}:{pattern.pattern})" if flags else f"(?:{pattern.pattern})"
+
+    def match(self, text: Optional[str]) -> List[TriggerHit]:
+        """Every trigger found in the text, in the order of the mapping."""
+        if not text:
+            return []
+        found: Dict[int, TriggerHit] = {}
+        for start, end, index in self._automaton.iter_matches(text):
+            hit = found.get(index)
+            if hit is None or start < hit.span[0]:
+                found[index] = TriggerHit(self._handlers[index], text[start:end], (start, end))
+
+        if self._regex is not None:
+            regex_found = 0
+            for match in self._regex.finditer(text):
+                index = int(match.lastgroup[1:])
+                if index not in found:
+                    found[index] = TriggerHit(self._handlers[index], match.group(), match.span())
+                    regex_found += 1
+                    if regex_found == self._regex_count:
+                        break
+        return [found[index] for index in sorted(found)]
+
+
+class TriggerFilter(MessageFilter):
+    """Match the text or caption against a TriggerEngine, hits are exposed as context.triggers."""
+
+    def __init__(self, engine: TriggerEngine):
+        super().__init__(name="TriggerFilter", data_filter=True)
+        self.engine = engine
+
+    def filter(self, message: Message) -> Optional[Dict[str, List[TriggerHit]]]:
+        hits = self.engine.match(message.text or message.caption)
+        if hits:
+            return {"triggers": hits}
+        return None
@@ -0,0 +1,116 @@
+import os
+import time
+import asyncio
+import logging
+import dotenv
+from collections import defaultdict, deque
+from typing import Deque, Dict, Iterable, Optional
+
+import httpx
+
+log = logging.getLogger("unsplash")
+dotenv.load_dotenv()
+
+UNSPLASH_API_URL = os.getenv("UNSPLASH_API_URL", "https://api.unsplash.com")
+UNSPLASH_API_KEY = os.getenv("UNSPLASH_API_KEY")
+
+
+class UnsplashProvider:
+    """
+    Serve Unsplash image URLs from a per-query buffer, so a trigger never waits on the API.
+    Buffers are refilled in the background with one request for `batch_size`
+    random photos when they run low. Refills pause when the hourly quota is
+    exhausted or the API fails. take() returns None when a buffer is empty.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        base_url: str = UNSPLASH_API_URL,
+        batch_size: int = 30,
+        low_water: int = 3,
+        timeout: float = 5.0,
+        error_backoff: float = 60.0,
+        quota_backoff: float = 15 * 60.0,
+    ):
+        self.api_key = api_key.strip() if api_key else None
+        self.base_url = base_url
+        self.batch_size = min(batch_size, 30)  # the API max for count
+        self.low_water = low_water
+        self.timeout = timeout
+        self.error_backoff = error_backoff
+        self.quota_backoff = quota_backoff
+        self._buffers: Dict[str, Deque[str]] = defaultdict(deque)
+        self._refills: Dict[str, asyncio.Task] = {}
+        self._paused_until = 0.0
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self, queries: Iterable[str] = ()):
+        """Open the pooled client and start filling the buffers of the given queries."""
+        if not self.api_key:
+            log.warning("Unsplash API key is not set, only local images will be used.")
+            return
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=4, max_keepalive_connections=4),
+            headers={"Authorization": f"Client-ID {self.api_key}", "Accept-Version": "v1"},
+        )
+        for query in queries:
+            self._schedule_refill(query)
+
+    async def close(self):
+        for task in self._refills.values():
+            task.cancel()
+        self._refills.clear()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def take(self, query: str = "random") -> Optional[str]:
+        """Pop an image URL for the query, None if none is ready."""
+        buffer = self._buffers[query]
+        url = buffer.popleft() if buffer else None
+        if len(buffer) <= self.low_water:
+            self._schedule_refill(query)
+        if url is None:
+            log.debug(f"No prefetched image for '{query}'")
+        return url
+
+    def _schedule_refill(self, query: str):
+        if self._client is None or query in self._refills or time.monotonic() < self._paused_until:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self._refill(query))
+        self._refills[query] = task
+        task.add_done_callback(lambda _: self._refills.pop(query, None))
+
+    async def _refill(self, query: str):
+        try:
+            response = await self._client.get(
+                "/photos/random", params={"query": query, "count": self.batch_size}
+            )
+            if response.status_code in (403, 429):
+                # hourly quota exhausted
+                log.warning(f"Unsplash quota exhausted, pausing for {self.quota_backoff}s")
+                self._paused_until = time.monotonic() + self.quota_backoff
+                return
+            response.raise_for_status()
+            urls = [photo["urls"]["small"] for photo in response.json()]
+        except (httpx.HTTPError, KeyError, TypeError, ValueError) as e:
+            log.error(f"Error fetching images for '{query}': {e}")
+            self._paused_until = time.monotonic() + self.error_backoff
+            return
+
+        self._buffers[query].extend(urls)
+        remaining = response.headers.get("X-Ratelimit-Remaining")
+        if remaining is not None and remaining.isdigit() and int(remaining) == 0:
+            log.warning(f"Unsplash quota used up, pausing for {self.quota_backoff}s")
+            self._paused_until = time.monotonic() + self.quota_backoff
+        log.debug(f"Prefetched {len(urls)} images for '{query}', quota left: {remaining}")
+
+
+unsplash = UnsplashProvider(UNSPLASH_API_KEY)
@@ -1,17 +1,26 @@
 from telegram.ext.filters import MessageFilter
+from utils.messages.todo.message_index import todo_message_index
 import logging
+import re
 
 log = logging.getLogger("todo reply filter")
 
+# the first word of a todo message, matched at the start only, the rest of the text is never read
+TODO_PREFIX = re.compile(r"\s*todo:(\s|$)", re.IGNORECASE)
+
 class FilterTodoReply(MessageFilter):
     def filter(self, message):
-        if not message.reply_to_message:
+        replied = message.reply_to_message
+        if not replied:
             return False
-        if not message.reply_to_message.text:
+        # a known todo message, the handler finds its todo id in the index
+        if replied.message_id in todo_message_index:
+            return True
+        if not replied.text:
             return False
-        
-        # log.debug(f"Filtering replied message text: {message.reply_to_message.text}")
-        return message.reply_to_message.text.split()[0].lower() == "todo:"
+
+        # log.debug(f"Filtering replied message text: {replied.text}")
+        return TODO_PREFIX.match(replied.text) is not None
 
 # Remember to initialize the class.
-filter_todo_reply = FilterTodoReply()
\ No newline at end of file
+filter_todo_reply = FilterTodoReply()
@@ -0,0 +1,59 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class TodoMessageIndex:
+    """
+    The todo id of the last `size` todo messages, most recently used kept.
+    Filled by todo_db on the db worker thread and read by the handlers on
+    the event loop, hence the lock. A miss doesn't mean the message is not
+    a todo, only that it was not seen recently.
+    """
+
+    def __init__(self, size: int = 4096):
+        self.size = size
+        self._todos: OrderedDict[int, int] = OrderedDict()  # message_id -> todo_id
+        self._messages: Dict[int, int] = {}  # todo_id -> message_id
+        self._lock = threading.Lock()
+
+    def get(self, message_id: int) -> Optional[int]:
+        with self._lock:
+            todo_id = self._todos.get(message_id)
+            if todo_id is not None:
+                self._todos.move_to_end(message_id)
+            return todo_id
+
+    def __contains__(self, message_id: int) -> bool:
+        return message_id in self._todos
+
+    def set(self, todo_id: int, message_id: Optional[int]):
+        """Point the todo to its message, forgetting the one it had before."""
+        with self._lock:
+            old_message_id = self._messages.pop(todo_id, None)
+            if old_message_id is not None:
+                self._todos.pop(old_message_id, None)
+            if message_id is None:
+                return
+            stale_todo_id = self._todos.pop(message_id, None)
+            if stale_todo_id is not None:
+                self._messages.pop(stale_todo_id, None)
+            self._todos[message_id] = todo_id
+            self._messages[todo_id] = message_id
+            if len(self._todos) > self.size:
+                _, evicted_todo_id = self._todos.popitem(last=False)
+                self._messages.pop(evicted_todo_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._todos.clear()
+            self._messages.clear()
+
+    def discard(self, message_id: int):
+        with self._lock:
+            todo_id = self._todos.pop(message_id, None)
+            if todo_id is not None:
+                self._messages.pop(todo_id, None)
+
+
+todo_message_index = TodoMessageIndex()
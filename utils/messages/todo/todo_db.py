@@ -1,9 +1,12 @@
-import os
 import sqlite3
 import logging
-import textwrap
-import dotenv
+import threading
+from dataclasses import dataclass, replace
 from enum import StrEnum, auto
+from typing import Iterator, List, Optional, Tuple
+from utils.db import storage
+from utils.markdown import Template
+from utils.messages.todo.message_index import todo_message_index
 
 
 class TodoItem:
@@ -28,6 +31,12 @@ class TodoItem:
         NORMAL = "normal"
         HIGH = "high"
 
+    # no per-instance __dict__, todo lists and exports can be large
+    __slots__ = (
+        "id", "user_id", "text", "status", "priority",
+        "message_id", "deleted", "network", "date", "update_date",
+    )
+
     def __init__(
         self,
         user_id: str,
@@ -53,31 +62,14 @@ class TodoItem:
         self.update_date = update_date  # This will be set when the item is updated in the database
 
     def __repr__(self):
-        # Priority emojis
-        priority_emoji = {
-            self.Priority.LOW: "🟢",
-            self.Priority.NORMAL: "🟡",
-            self.Priority.HIGH: "🔴",
-        }.get(self.priority, "")
-
-        # Status emojis
-        status_emoji = {
-            self.Status.ACTIVE: "⏳",
-            self.Status.DONE: "✅",
-        }.get(self.status, "")
-
-        # Create main text part
-        string = textwrap.dedent(
-            f"""
-            TODO:
-            ```
-            {self.text}
-            ```
-            ID: {self.id}
-            Priority: {priority_emoji} {self.priority}
-            Status: {status_emoji} {self.status}
-            Added by: {self.user_id}
-            """
+        string = _TODO_TEMPLATE.render(
+            text=self.text,
+            id=self.id,
+            priority_emoji=PRIORITY_EMOJI.get(self.priority, ""),
+            priority=self.priority,
+            status_emoji=STATUS_EMOJI.get(self.status, ""),
+            status=self.status,
+            user_id=self.user_id,
         )
 
         if self.date:
@@ -89,116 +81,310 @@ class TodoItem:
         if self.network:
             string += f"Network: {self.network}"
 
-        if self.message_id:
-            string += f"Message ID: {self.message_id}"
-
         return string
 
 
+# built once, escaped by the caller with escape_protected_chars
+_TODO_TEMPLATE = Template(
+    """
+    TODO:
+    ```
+    {text}
+    ```
+    ID: {id}
+    Priority: {priority_emoji} {priority}
+    Status: {status_emoji} {status}
+    Added by: {user_id}
+    """,
+    escape=None,
+)
+PRIORITY_EMOJI = {
+    TodoItem.Priority.LOW: "🟢",
+    TodoItem.Priority.NORMAL: "🟡",
+    TodoItem.Priority.HIGH: "🔴",
+}
+STATUS_EMOJI = {
+    TodoItem.Status.ACTIVE: "⏳",
+    TodoItem.Status.DONE: "✅",
+}
+
+
 log = logging.getLogger("todo_db")
-dotenv.load_dotenv()
+
+@dataclass
+class TodoMove:
+    """A todo being moved to another chat, see set_todo_item_status."""
+    todo_id: int
+    source_chat_id: int
+    source_message_id: int
+    target_chat_id: int
+    target_thread_id: Optional[int] = None
+    new_message_id: Optional[int] = None
+
 
 ## DATA
-DB_FILE_PATH = os.getenv("DB_FILE_PATH", "./db.db")
 TABLE_NAME = "todo_v2"
-os.makedirs(os.path.dirname(DB_FILE_PATH), exist_ok=True)
+OUTBOX_TABLE_NAME = "todo_outbox"
+FTS_TABLE_NAME = "todo_fts"
+# snippet() highlight markers, control characters can't clash with the todo text
+SNIPPET_START, SNIPPET_END = "\x02", "\x03"
+# order of the todo board, high priority first
+PRIORITY_ORDER = [TodoItem.Priority.HIGH, TodoItem.Priority.NORMAL, TodoItem.Priority.LOW]
+# queries must use this same expression for sqlite to use idx_todo_board
+PRIORITY_RANK = (
+    f"(CASE {TodoItem.Label.PRIORITY} "
+    + " ".join(f"WHEN '{priority}' THEN {rank}" for rank, priority in enumerate(PRIORITY_ORDER))
+    + f" ELSE {len(PRIORITY_ORDER)} END)"
+)
+# largest todo id handed out, see reserve_todo_id
+_last_todo_id = 0
+_todo_id_lock = threading.Lock()
 
 
 # init db on module import
 def init_db():
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
+    with storage.connection() as conn:
+        conn.execute(
+            f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+            {TodoItem.Label.ID} INTEGER PRIMARY KEY AUTOINCREMENT,
+            {TodoItem.Label.USER_ID} TEXT NOT NULL,
+            {TodoItem.Label._message_id} INTEGER UNIQUE,
+            {TodoItem.Label._deleted} INTEGER DEFAULT 0,
+            {TodoItem.Label.TEXT} TEXT NOT NULL,
+            {TodoItem.Label.DATE} DATE DEFAULT (datetime('now', 'localtime') ),
+            {TodoItem.Label.UPDATE_DATE} DATE DEFAULT (datetime('now', 'localtime') ),
+            {TodoItem.Label.STATUS} TEXT DEFAULT 'active',
+            {TodoItem.Label.PRIORITY} TEXT DEFAULT 'normal',
+            {TodoItem.Label.NETWORK} TEXT DEFAULT 'telegram'
+        )
+        """
+        )
+        # keyset pagination of the todo board, see get_todo_page
+        conn.execute(
+            f"""
+        CREATE INDEX IF NOT EXISTS idx_todo_board
+        ON {TABLE_NAME} ({TodoItem.Label.STATUS}, {PRIORITY_RANK}, {TodoItem.Label.DATE}, {TodoItem.Label.ID})
+        """
+        )
+        # todos moved between chats, until the old message is deleted
+        conn.execute(
+            f"""
+        CREATE TABLE IF NOT EXISTS {OUTBOX_TABLE_NAME} (
+            todo_id INTEGER PRIMARY KEY REFERENCES {TABLE_NAME}({TodoItem.Label.ID}),
+            source_chat_id INTEGER NOT NULL,
+            source_message_id INTEGER NOT NULL,
+            target_chat_id INTEGER NOT NULL,
+            target_thread_id INTEGER,
+            new_message_id INTEGER,
+            insert_date DATE DEFAULT (datetime('now', 'localtime') )
+        )
+        """
+        )
+        _init_fts(conn)
+        _load_message_index(conn)
+        _load_last_todo_id(conn)
+
+
+def _load_last_todo_id(conn: sqlite3.Connection):
+    global _last_todo_id
+    # sqlite_sequence keeps the largest id ever used, deleted todos included
+    row = conn.execute(
+        f"""
+        SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0),
+                   COALESCE((SELECT MAX({TodoItem.Label.ID}) FROM {TABLE_NAME}), 0))
+        """,
+        (TABLE_NAME,),
+    ).fetchone()
+    _last_todo_id = row[0]
+
+
+def _load_message_index(conn: sqlite3.Connection):
+    """Fill the message index with the most recently updated todos."""
+    rows = conn.execute(
+        f"""
+        SELECT {TodoItem.Label.ID}, {TodoItem.Label._message_id}
+        FROM {TABLE_NAME}
+        WHERE {TodoItem.Label._message_id} IS NOT NULL
+        AND {TodoItem.Label._deleted} = 0
+        ORDER BY {TodoItem.Label.UPDATE_DATE} DESC, {TodoItem.Label.ID} DESC
+        LIMIT ?
+        """,
+        (todo_message_index.size,),
+    ).fetchall()
+    # the most recent last, it is the last to be evicted
+    for todo_id, message_id in reversed(rows):
+        todo_message_index.set(todo_id, message_id)
+
 
-    cursor.execute(
+def _init_fts(conn: sqlite3.Connection):
+    """
+    Full-text index of the todo texts: an external content FTS5 table
+    (the text is stored only once, in todo_v2) kept in sync by triggers.
+    """
+    created = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE_NAME,)
+    ).fetchone() is None
+    conn.execute(
         f"""
-    CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
-        {TodoItem.Label.ID} INTEGER PRIMARY KEY AUTOINCREMENT,
-        {TodoItem.Label.USER_ID} TEXT NOT NULL,
-        {TodoItem.Label._message_id} INTEGER UNIQUE,
-        {TodoItem.Label._deleted} INTEGER DEFAULT 0,
-        {TodoItem.Label.TEXT} TEXT NOT NULL,
-        {TodoItem.Label.DATE} DATE DEFAULT (datetime('now', 'localtime') ),
-        {TodoItem.Label.UPDATE_DATE} DATE DEFAULT (datetime('now', 'localtime') ),
-        {TodoItem.Label.STATUS} TEXT DEFAULT 'active',
-        {TodoItem.Label.PRIORITY} TEXT DEFAULT 'normal',
-        {TodoItem.Label.NETWORK} TEXT DEFAULT 'telegram'
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE_NAME} USING fts5(
+        {TodoItem.Label.TEXT},
+        content='{TABLE_NAME}',
+        content_rowid='{TodoItem.Label.ID}',
+        tokenize='unicode61 remove_diacritics 2'
     )
     """
     )
-
-    conn.commit()
-    conn.close()
+    conn.execute(
+        f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE_NAME}_insert AFTER INSERT ON {TABLE_NAME} BEGIN
+        INSERT INTO {FTS_TABLE_NAME}(rowid, {TodoItem.Label.TEXT})
+        VALUES (new.{TodoItem.Label.ID}, new.{TodoItem.Label.TEXT});
+    END
+    """
+    )
+    conn.execute(
+        f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE_NAME}_delete AFTER DELETE ON {TABLE_NAME} BEGIN
+        INSERT INTO {FTS_TABLE_NAME}({FTS_TABLE_NAME}, rowid, {TodoItem.Label.TEXT})
+        VALUES ('delete', old.{TodoItem.Label.ID}, old.{TodoItem.Label.TEXT});
+    END
+    """
+    )
+    conn.execute(
+        f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE_NAME}_update AFTER UPDATE OF {TodoItem.Label.TEXT} ON {TABLE_NAME} BEGIN
+        INSERT INTO {FTS_TABLE_NAME}({FTS_TABLE_NAME}, rowid, {TodoItem.Label.TEXT})
+        VALUES ('delete', old.{TodoItem.Label.ID}, old.{TodoItem.Label.TEXT});
+        INSERT INTO {FTS_TABLE_NAME}(rowid, {TodoItem.Label.TEXT})
+        VALUES (new.{TodoItem.Label.ID}, new.{TodoItem.Label.TEXT});
+    END
+    """
+    )
+    if created:
+        # index the todos added before the fts table existed
+        conn.execute(f"INSERT INTO {FTS_TABLE_NAME}({FTS_TABLE_NAME}) VALUES ('rebuild')")
+        log.info("Full-text index of the todos built")
 
 
 init_db()
+# a todo whose message id was rolled back would be found in the index
+storage.on_rollback(todo_message_index.clear)
 
 ## DB ACCESS
 
+# every column of a TodoItem, in the order _todo_from_row reads them.
+# Each query selects all of them, a TodoItem is never half populated
+TODO_COLUMNS = (
+    TodoItem.Label.ID, TodoItem.Label.USER_ID, TodoItem.Label.TEXT, TodoItem.Label.DATE,
+    TodoItem.Label.UPDATE_DATE, TodoItem.Label.STATUS, TodoItem.Label.PRIORITY,
+    TodoItem.Label.NETWORK, TodoItem.Label._message_id, TodoItem.Label._deleted,
+)
+_SELECT_COLUMNS = ", ".join(TODO_COLUMNS)
+# rows fetched at a time by iter_todo_items
+FETCH_SIZE = 256
+
+
+def _todo_from_row(row) -> Optional[TodoItem]:
+    """The TodoItem of a row starting with TODO_COLUMNS, extra columns are ignored."""
+    if row is None:
+        return None
+    return TodoItem(
+        db_id=row[0],
+        user_id=row[1],
+        text=row[2],
+        date=row[3],
+        update_date=row[4],
+        status=row[5],
+        priority=row[6],
+        network=row[7],
+        message_id=row[8],
+        deleted=bool(row[9]),
+    )
 
-def get_todo_item(id: int) -> TodoItem:
-    """Get a todo item from the database by its ID."""
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
 
-    cursor.execute(
-        f"""
-        SELECT {TodoItem.Label.ID}, {TodoItem.Label.USER_ID}, {TodoItem.Label.TEXT},
-               {TodoItem.Label.DATE}, {TodoItem.Label.STATUS}, {TodoItem.Label.PRIORITY},
-               {TodoItem.Label.NETWORK}, {TodoItem.Label.UPDATE_DATE}
-        FROM {TABLE_NAME}
-        WHERE {TodoItem.Label.ID} = ?
-        """,
-        (id,),
-    )
-    row = cursor.fetchone()
-    conn.close()
+def _todo_row_factory(cursor: sqlite3.Cursor, row: tuple) -> TodoItem:
+    return _todo_from_row(row)
 
-    if row:
-        todo_item = TodoItem(
-            user_id=row[1],
-            text=row[2],
-            status=row[4],
-            priority=row[5],
-            network=row[6],
-            update_date=row[7],
-            db_id=row[0],
-        )
-        todo_item.date = row[3]
-        return todo_item
-    else:
-        return None
+
+def _select_todos(conn: sqlite3.Connection, query: str, params=()) -> sqlite3.Cursor:
+    """Run a query selecting TODO_COLUMNS, the cursor returns TodoItems."""
+    cursor = conn.execute(query, params)
+    cursor.row_factory = _todo_row_factory
+    return cursor
+
+
+def get_todo_item(id: int) -> TodoItem:
+    """Get a todo item from the database by its ID."""
+    with storage.connection() as conn:
+        return _select_todos(
+            conn,
+            f"""
+            SELECT {_SELECT_COLUMNS}
+            FROM {TABLE_NAME}
+            WHERE {TodoItem.Label.ID} = ?
+            """,
+            (id,),
+        ).fetchone()
     
 def get_todo_item_by_message_id(message_id: int) -> TodoItem:
     """Get a todo item from the database by its message ID."""
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
+    with storage.connection() as conn:
+        todo_item = _select_todos(
+            conn,
+            f"""
+            SELECT {_SELECT_COLUMNS}
+            FROM {TABLE_NAME}
+            WHERE {TodoItem.Label._message_id} = ?
+            """,
+            (message_id,),
+        ).fetchone()
+
+    if todo_item:
+        todo_message_index.set(todo_item.id, message_id)
+    return todo_item
 
-    cursor.execute(
-        f"""
-        SELECT {TodoItem.Label.ID}, {TodoItem.Label.USER_ID}, {TodoItem.Label.TEXT},
-               {TodoItem.Label.DATE}, {TodoItem.Label.STATUS}, {TodoItem.Label.PRIORITY},
-               {TodoItem.Label.NETWORK}
-        FROM {TABLE_NAME}
-        WHERE {TodoItem.Label._message_id} = ?
-        """,
-        (message_id,),
-    )
-    row = cursor.fetchone()
-    conn.close()
 
-    if row:
-        todo_item = TodoItem(
-            user_id=row[1],
-            text=row[2],
-            status=row[4],
-            priority=row[5],
-            network=row[6],
-            db_id=row[0],
-        )
-        todo_item.date = row[3]
-        return todo_item
-    else:
-        return None
+def reserve_todo_id() -> int:
+    """
+    The id of a todo to insert later with add_todo_item_full, so its message
+    can be sent before the insert. Ids come from memory, every insert of this
+    process takes its id from here and none is handed out twice. Another
+    process sharing the db may still take it first, see add_todo_item_full.
+    """
+    global _last_todo_id
+    with _todo_id_lock:
+        _last_todo_id += 1
+        return _last_todo_id
+
+
+def _skip_todo_ids(todo_id: int):
+    """Never reserve ids up to todo_id, used by another process."""
+    global _last_todo_id
+    with _todo_id_lock:
+        _last_todo_id = max(_last_todo_id, todo_id)
+
+
+def _insert_todo_item(conn: sqlite3.Connection, db_id: Optional[int], *values) -> tuple:
+    # a NULL id is assigned by AUTOINCREMENT
+    return conn.execute(
+        f"""
+    INSERT INTO {TABLE_NAME} (
+        {TodoItem.Label.ID},
+        {TodoItem.Label.USER_ID},
+        {TodoItem.Label.TEXT},
+        {TodoItem.Label.STATUS},
+        {TodoItem.Label.PRIORITY},
+        {TodoItem.Label.NETWORK},
+        {TodoItem.Label._message_id},
+        {TodoItem.Label.DATE},
+        {TodoItem.Label.UPDATE_DATE}
+    ) VALUES (?, ?, ?, ?, ?, ?, ?,
+              COALESCE(?, datetime('now', 'localtime')), COALESCE(?, datetime('now', 'localtime')))
+    RETURNING {_SELECT_COLUMNS}
+    """,
+        (db_id, *values),
+    ).fetchone()
 
 
 def add_todo_item_full(
@@ -207,62 +393,62 @@ def add_todo_item_full(
     status: str = "active",
     priority: str = "normal",
     network: str = None,
+    message_id: int = None,
+    db_id: int = None,
+    date: str = None,
 ) -> TodoItem:
-    """Add a new todo item to the database."""
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-
+    """
+    Add a new todo item to the database, with its message id if it was
+    already sent, and return it as stored. A single write.
+    If the reserved db_id was taken by another process the todo gets a new
+    id: callers that showed db_id must check the id of the returned item.
+    """
+    if db_id is None:
+        db_id = reserve_todo_id()
+    values = (user_id, text, status, priority, network, message_id, date, date)
     try:
-        cursor.execute(
-            f"""
-        INSERT INTO {TABLE_NAME} (
-            {TodoItem.Label.USER_ID},
-            {TodoItem.Label.TEXT},
-            {TodoItem.Label.STATUS},
-            {TodoItem.Label.PRIORITY},
-            {TodoItem.Label.NETWORK}
-        ) VALUES (?, ?, ?, ?, ?)
-        """,
-            (user_id, text, status, priority, network),
-        )
-        conn.commit()
-        todo_id = cursor.lastrowid
-
-        log.info(f"Todo item added with ID: {todo_id}")
+        with storage.connection() as conn:
+            try:
+                row = _insert_todo_item(conn, db_id, *values)
+            except sqlite3.IntegrityError as e:
+                if f"{TABLE_NAME}.{TodoItem.Label.ID}" not in str(e):
+                    raise
+                log.warning(f"Todo ID {db_id} already taken by another process, adding with a new one")
+                row = _insert_todo_item(conn, None, *values)
+                _skip_todo_ids(row[0])
     except sqlite3.Error as e:
         log.error(f"Error adding todo item: {e}")
-        conn.rollback()
-        return None
-    finally:
-        conn.close()
-    todo_item = get_todo_item(todo_id)
-    if not todo_item:
-        log.error(f"Failed to retrieve the added todo item with ID: {todo_id}")
         return None
+
+    todo_item = _todo_from_row(row)
+    log.info(f"Todo item added with ID: {todo_item.id}")
+    if message_id is not None:
+        todo_message_index.set(todo_item.id, message_id)
     return todo_item
 
 
-def add_todo_item(todoItem: TodoItem) -> TodoItem:
+def add_todo_item(todoItem: TodoItem, message_id: int = None) -> TodoItem:
     return add_todo_item_full(
         user_id=todoItem.user_id,
         text=todoItem.text,
         status=todoItem.status,
         priority=todoItem.priority,
         network=todoItem.network,
+        message_id=message_id,
+        db_id=todoItem.id,
+        date=todoItem.date,
     )
 
 
-def get_todo_items(
+def iter_todo_items(
     user_id: str, status: str = "active", priority: str = None, network: str = None
-) -> list[TodoItem]:
-    """Get todo items from the database."""
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-
+) -> Iterator[TodoItem]:
+    """
+    Stream the todo items, FETCH_SIZE rows at a time: memory stays flat for
+    any number of todos. Blocking, not meant to be iterated on the event loop.
+    """
     query = f"""
-        SELECT {TodoItem.Label.ID}, {TodoItem.Label.USER_ID}, {TodoItem.Label.TEXT},
-               {TodoItem.Label.DATE}, {TodoItem.Label.STATUS}, {TodoItem.Label.PRIORITY},
-               {TodoItem.Label.NETWORK}
+        SELECT {_SELECT_COLUMNS}
         FROM {TABLE_NAME}
         WHERE {TodoItem.Label.USER_ID} = ?
         AND {TodoItem.Label.STATUS} = ?
@@ -277,102 +463,306 @@ def get_todo_items(
         query += f" AND {TodoItem.Label.NETWORK} = ?"
         params.append(network)
 
-    cursor.execute(query, tuple(params))
-    rows = cursor.fetchall()
-    conn.close()
-
-    return [
-        TodoItem(
-            user_id=row[1],
-            text=row[2],
-            status=row[4],
-            priority=row[5],
-            network=row[6],
-        )
-        for row in rows
-    ]
+    with storage.connection() as conn:
+        cursor = _select_todos(conn, query, tuple(params))
+        while True:
+            todo_items = cursor.fetchmany(FETCH_SIZE)
+            if not todo_items:
+                break
+            yield from todo_items
+
+
+def get_todo_items(
+    user_id: str, status: str = "active", priority: str = None, network: str = None
+) -> list[TodoItem]:
+    """Get todo items from the database."""
+    return list(iter_todo_items(user_id, status, priority, network))
+
+def get_todo_page(
+    status: str = TodoItem.Status.ACTIVE,
+    priority: Optional[str] = None,
+    network: Optional[str] = None,
+    after_id: Optional[int] = None,
+    limit: int = 10,
+) -> List[TodoItem]:
+    """
+    A page of todo items ordered by priority (high first) and insert date,
+    starting after the item `after_id`. Keyset pagination on idx_todo_board:
+    a page costs the same at any depth.
+    """
+    select = f"""
+        SELECT {_SELECT_COLUMNS}
+        FROM {TABLE_NAME}
+        WHERE {TodoItem.Label.STATUS} = ?
+        AND {PRIORITY_RANK} = ?
+        AND {TodoItem.Label._deleted} = 0
+    """
+    params = []
+    if network:
+        select += f" AND {TodoItem.Label.NETWORK} = ? COLLATE NOCASE"
+        params.append(network)
+
+    ranks = range(len(PRIORITY_ORDER) + 1)
+    if priority:
+        ranks = [PRIORITY_ORDER.index(priority)]
+
+    todo_items = []
+    with storage.connection() as conn:
+        cursor = None
+        if after_id is not None:
+            cursor = conn.execute(
+                f"SELECT {PRIORITY_RANK}, {TodoItem.Label.DATE} FROM {TABLE_NAME} WHERE {TodoItem.Label.ID} = ?",
+                (after_id,),
+            ).fetchone()
+
+        # one index range per rank: with the rank fixed the index is already
+        # ordered by date and id, a row value across the rank would need a sort
+        for rank in ranks:
+            if cursor is not None and rank < cursor[0]:
+                continue
+            query = select
+            rank_params = [status, rank, *params]
+            if cursor is not None and rank == cursor[0]:
+                query += f" AND ({TodoItem.Label.DATE}, {TodoItem.Label.ID}) > (?, ?)"
+                rank_params += [cursor[1], after_id]
+            query += f" ORDER BY {TodoItem.Label.DATE}, {TodoItem.Label.ID} LIMIT ?"
+            rank_params.append(limit - len(todo_items))
+            todo_items += _select_todos(conn, query, rank_params).fetchall()
+            if len(todo_items) >= limit:
+                break
+
+    return todo_items
+
+
+def _match_query(text: str) -> str:
+    """Every word of the text as a quoted prefix term, user input can't break the FTS5 syntax."""
+    return " ".join('"' + word.replace('"', '""') + '"*' for word in text.split())
+
+
+def search_todo_items(
+    text: str,
+    after: Optional[Tuple[float, int]] = None,
+    limit: int = 10,
+) -> List[Tuple[TodoItem, str, float]]:
+    """
+    Todo items matching all the words of the text (as prefixes), best bm25 first.
+    Returns (item, snippet, rank): in the snippet the matches are between
+    SNIPPET_START and SNIPPET_END. `after` is the (rank, id) of the last
+    result of the previous page.
+    """
+    match = _match_query(text)
+    if not match:
+        return []
+    query = f"""
+        SELECT {", ".join(f"t.{column}" for column in TODO_COLUMNS)},
+               snippet({FTS_TABLE_NAME}, 0, '{SNIPPET_START}', '{SNIPPET_END}', '…', 12),
+               bm25({FTS_TABLE_NAME}) AS score
+        FROM {FTS_TABLE_NAME}
+        JOIN {TABLE_NAME} AS t ON t.{TodoItem.Label.ID} = {FTS_TABLE_NAME}.rowid
+        WHERE {FTS_TABLE_NAME} MATCH ?
+        AND t.{TodoItem.Label._deleted} = 0
+    """
+    params = [match]
+    if after is not None:
+        query += f" AND (score, t.{TodoItem.Label.ID}) > (?, ?)"
+        params += list(after)
+    query += f" ORDER BY score, t.{TodoItem.Label.ID} LIMIT ?"
+    params.append(limit)
+
+    with storage.connection() as conn:
+        rows = conn.execute(query, tuple(params)).fetchall()
+
+    columns = len(TODO_COLUMNS)
+    return [(_todo_from_row(row), row[columns], row[columns + 1]) for row in rows]
+
 
 def set_todo_item_priority(
     id: int, priority: str
 ) -> TodoItem:
-    """Set the priority of a todo item."""
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-
-    cursor.execute(
-        f"""
-        UPDATE {TABLE_NAME}
-        SET {TodoItem.Label.PRIORITY} = ?,
-            {TodoItem.Label.UPDATE_DATE} = (datetime('now', 'localtime'))
-        WHERE {TodoItem.Label.ID} = ?
-        """,
-        (priority, id),
-    )
-    conn.commit()
-    conn.close()
+    """Set the priority of a todo item, None if there is no such item."""
+    with storage.connection() as conn:
+        row = conn.execute(
+            f"""
+            UPDATE {TABLE_NAME}
+            SET {TodoItem.Label.PRIORITY} = ?,
+                {TodoItem.Label.UPDATE_DATE} = (datetime('now', 'localtime'))
+            WHERE {TodoItem.Label.ID} = ?
+            RETURNING {_SELECT_COLUMNS}
+            """,
+            (priority, id),
+        ).fetchone()
 
-    return get_todo_item(id)
+    return _todo_from_row(row)
 
 def set_todo_item_status(
-    id: int, status: str
+    id: int, status: str, move: Optional[TodoMove] = None
 ) -> TodoItem:
-    """Set the status of a todo item."""
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-
-    cursor.execute(
-        f"""
-        UPDATE {TABLE_NAME}
-        SET {TodoItem.Label.STATUS} = ? ,
-            {TodoItem.Label.UPDATE_DATE} = (datetime('now', 'localtime'))
-        WHERE {TodoItem.Label.ID} = ?
-        """,
-        (status, id),
-    )
-    conn.commit()
-    conn.close()
-
-    return get_todo_item(id)
+    """
+    Set the status of a todo item, None if there is no such item.
+    With `move`, the move is recorded in the outbox in the same transaction.
+    """
+    with storage.connection() as conn:
+        row = conn.execute(
+            f"""
+            UPDATE {TABLE_NAME}
+            SET {TodoItem.Label.STATUS} = ? ,
+                {TodoItem.Label.UPDATE_DATE} = (datetime('now', 'localtime'))
+            WHERE {TodoItem.Label.ID} = ?
+            RETURNING {_SELECT_COLUMNS}
+            """,
+            (status, id),
+        ).fetchone()
+        if row is not None and move is not None:
+            _record_todo_moves(conn, [move])
+
+    return _todo_from_row(row)
 
 def set_todo_item_network(
     id: int, network: str
 ) -> TodoItem:
-    """Set the network of a todo item."""
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
-
-    cursor.execute(
-        f"""
-        UPDATE {TABLE_NAME}
-        SET {TodoItem.Label.NETWORK} = ?,
-            {TodoItem.Label.UPDATE_DATE} = (datetime('now', 'localtime'))
-        WHERE {TodoItem.Label.ID} = ?
-        """,
-        (network, id),
-    )
-    conn.commit()
-    conn.close()
+    """Set the network of a todo item, None if there is no such item."""
+    with storage.connection() as conn:
+        row = conn.execute(
+            f"""
+            UPDATE {TABLE_NAME}
+            SET {TodoItem.Label.NETWORK} = ?,
+                {TodoItem.Label.UPDATE_DATE} = (datetime('now', 'localtime'))
+            WHERE {TodoItem.Label.ID} = ?
+            RETURNING {_SELECT_COLUMNS}
+            """,
+            (network, id),
+        ).fetchone()
 
-    return get_todo_item(id)
+    return _todo_from_row(row)
 
 
 def set_todo_item_message_id(
     id: int, message_id: int
 ) -> TodoItem:
-    """Set the message ID of a todo item."""
-    conn = sqlite3.connect(DB_FILE_PATH)
-    cursor = conn.cursor()
+    """Set the message ID of a todo item, None if there is no such item."""
+    with storage.connection() as conn:
+        row = conn.execute(
+            f"""
+            UPDATE {TABLE_NAME}
+            SET {TodoItem.Label._message_id} = ?
+            WHERE {TodoItem.Label.ID} = ?
+            RETURNING {_SELECT_COLUMNS}
+            """,
+            (message_id, id),
+        ).fetchone()
+    if row:
+        todo_message_index.set(id, message_id)
+
+    return _todo_from_row(row)
+
+
+def _set_todo_items(
+    ids: List[int], label: str, value: str, move: Optional[TodoMove] = None
+) -> List[TodoItem]:
+    """
+    Set a field of many todo items with a single statement. Only the items
+    whose value changes are updated and returned, ordered by id. With `move`,
+    the move of each updated item that has a message is recorded in the
+    outbox in the same transaction, its todo_id and source_message_id filled per item.
+    """
+    if not ids:
+        return []
+    placeholders = ", ".join("?" * len(ids))
+    with storage.connection() as conn:
+        cursor = conn.execute(
+            f"""
+            UPDATE {TABLE_NAME}
+            SET {label} = ?,
+                {TodoItem.Label.UPDATE_DATE} = (datetime('now', 'localtime'))
+            WHERE {TodoItem.Label.ID} IN ({placeholders})
+            AND {label} IS NOT ?
+            AND {TodoItem.Label._deleted} = 0
+            RETURNING {_SELECT_COLUMNS}
+            """,
+            (value, *ids, value),
+        )
+        cursor.row_factory = _todo_row_factory
+        # RETURNING doesn't follow any order
+        todo_items = sorted(cursor, key=lambda todo_item: todo_item.id)
+        if move is not None:
+            _record_todo_moves(conn, [
+                replace(move, todo_id=todo_item.id, source_message_id=todo_item.message_id)
+                for todo_item in todo_items
+                if todo_item.message_id is not None
+            ])
 
-    cursor.execute(
+    log.info(f"Set {label} = {value} on {len(todo_items)} of {len(ids)} todo items")
+    return todo_items
+
+
+def set_todo_items_status(
+    ids: List[int], status: str, move: Optional[TodoMove] = None
+) -> List[TodoItem]:
+    """Batch set_todo_item_status, see _set_todo_items."""
+    return _set_todo_items(ids, TodoItem.Label.STATUS, status, move)
+
+
+def set_todo_items_priority(
+    ids: List[int], priority: str
+) -> List[TodoItem]:
+    """Batch set_todo_item_priority, see _set_todo_items."""
+    return _set_todo_items(ids, TodoItem.Label.PRIORITY, priority)
+
+
+## MOVES OUTBOX
+# A move is recorded before the todo is sent to the target chat, marked as sent
+# together with the new message id, and removed once the old message is deleted.
+# Moves still in the outbox at startup were interrupted and are resumed.
+
+
+def _record_todo_moves(conn: sqlite3.Connection, moves: List[TodoMove]) -> None:
+    """Record moves before sending the todos to the target chat, in the transaction of the status change."""
+    conn.executemany(
         f"""
-        UPDATE {TABLE_NAME}
-        SET {TodoItem.Label._message_id} = ?
-        WHERE {TodoItem.Label.ID} = ?
+        INSERT OR REPLACE INTO {OUTBOX_TABLE_NAME} (
+            todo_id, source_chat_id, source_message_id, target_chat_id, target_thread_id
+        ) VALUES (?, ?, ?, ?, ?)
         """,
-        (message_id, id),
+        [
+            (move.todo_id, move.source_chat_id, move.source_message_id,
+             move.target_chat_id, move.target_thread_id)
+            for move in moves
+        ],
     )
-    conn.commit()
-    conn.close()
 
-    return get_todo_item(id)
-    
\ No newline at end of file
+
+def set_todo_move_sent(todo_id: int, new_message_id: int) -> None:
+    """Point the todo to its new message, in the same transaction as the move."""
+    with storage.connection() as conn:
+        conn.execute(
+            f"""
+            UPDATE {TABLE_NAME}
+            SET {TodoItem.Label._message_id} = ?
+            WHERE {TodoItem.Label.ID} = ?
+            """,
+            (new_message_id, todo_id),
+        )
+        conn.execute(
+            f"UPDATE {OUTBOX_TABLE_NAME} SET new_message_id = ? WHERE todo_id = ?",
+            (new_message_id, todo_id),
+        )
+    todo_message_index.set(todo_id, new_message_id)
+
+
+def finish_todo_move(todo_id: int) -> None:
+    with storage.connection() as conn:
+        conn.execute(f"DELETE FROM {OUTBOX_TABLE_NAME} WHERE todo_id = ?", (todo_id,))
+
+
+def get_pending_todo_moves() -> List[TodoMove]:
+    """The moves interrupted before the old message was deleted."""
+    with storage.connection() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT todo_id, source_chat_id, source_message_id,
+                   target_chat_id, target_thread_id, new_message_id
+            FROM {OUTBOX_TABLE_NAME}
+            ORDER BY insert_date
+            """
+        ).fetchall()
+    return [TodoMove(*row) for row in rows]
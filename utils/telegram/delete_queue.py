@@ -0,0 +1,98 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, Optional, Set
+
+from telegram import Bot, Message
+from telegram.error import BadRequest, TelegramError
+
+from .rate_limiter import SendPriority, send_priority
+
+log = logging.getLogger("delete_queue")
+
+# deleteMessages accepts up to 100 message ids
+MAX_BATCH = 100
+
+
+class DeleteQueue:
+    """
+    Collect the messages to delete per chat and delete them in bulk with
+    deleteMessages, `interval` seconds after the first one was queued.
+    Failed batches are queued again after `retry_delay` seconds, up to
+    `max_attempts` times. Messages that can't be deleted anymore are skipped by telegram.
+    """
+
+    def __init__(self, interval: float = 1.0, retry_delay: float = 5.0, max_attempts: int = 3):
+        self.interval = interval
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+        self._bot: Optional[Bot] = None
+        # chat_id -> {message_id: failed attempts}
+        self._pending: Dict[int, Dict[int, int]] = defaultdict(dict)
+        self._task: Optional[asyncio.Task] = None  # waiting for the interval to end
+        self._flushes: Set[asyncio.Task] = set()  # every _flush_later task not done yet
+        self._closed = False
+
+    def delete(self, message: Message):
+        """Queue a message for deletion."""
+        self.delete_by_id(message.get_bot(), message.chat_id, message.message_id)
+
+    def delete_by_id(self, bot: Bot, chat_id: int, message_id: int, attempts: int = 0):
+        self._bot = bot
+        self._pending[chat_id].setdefault(message_id, attempts)
+        if self._task is None and not self._closed:
+            self._task = asyncio.get_running_loop().create_task(self._flush_later())
+            self._flushes.add(self._task)
+            self._task.add_done_callback(self._flushes.discard)
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval)
+        self._task = None
+        await self.flush()
+
+    @send_priority(SendPriority.NORMAL)
+    async def flush(self):
+        """Delete everything queued so far."""
+        pending, self._pending = self._pending, defaultdict(dict)
+        batches = []
+        for chat_id, messages in pending.items():
+            message_ids = list(messages)
+            for start in range(0, len(message_ids), MAX_BATCH):
+                batch = {message_id: messages[message_id] for message_id in message_ids[start:start + MAX_BATCH]}
+                batches.append(self._delete_batch(chat_id, batch))
+        await asyncio.gather(*batches)
+
+    async def _delete_batch(self, chat_id: int, messages: Dict[int, int]):
+        try:
+            await self._bot.delete_messages(chat_id, list(messages))
+            log.debug(f"Deleted {len(messages)} messages in {chat_id}")
+        except BadRequest as e:
+            # retrying won't help, e.g. the bot is not an admin of the chat
+            log.error(f"Error deleting {len(messages)} messages in {chat_id}: {e}")
+        except TelegramError as e:
+            retry = {message_id: attempts + 1 for message_id, attempts in messages.items()
+                     if attempts + 1 < self.max_attempts}
+            log.warning(f"Error deleting {len(messages)} messages in {chat_id}, retrying {len(retry)}: {e}")
+            if retry:
+                asyncio.get_running_loop().call_later(self.retry_delay, self._requeue, chat_id, retry)
+
+    def _requeue(self, chat_id: int, messages: Dict[int, int]):
+        if self._closed:
+            log.warning(f"Not retrying {len(messages)} deletions in {chat_id}, the queue is closed")
+            return
+        for message_id, attempts in messages.items():
+            self.delete_by_id(self._bot, chat_id, message_id, attempts)
+
+    async def close(self):
+        """Delete what is still queued and wait for the deletions in flight, called when the bot stops."""
+        self._closed = True
+        if self._task is not None:
+            # still waiting for the interval, its messages are deleted below
+            self._task.cancel()
+            self._task = None
+        await asyncio.gather(*self._flushes, return_exceptions=True)
+        if self._pending:
+            await self.flush()
+
+
+delete_queue = DeleteQueue()
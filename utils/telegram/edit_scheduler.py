@@ -0,0 +1,99 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from telegram import Bot
+from telegram.error import BadRequest, TelegramError
+
+log = logging.getLogger("edit_scheduler")
+
+Key = Tuple[int, int]  # (chat_id, message_id)
+
+
+class EditScheduler:
+    """
+    Coalesce the edits of a message: only the last text scheduled within
+    `window` seconds is sent, and not at all if it is what the message
+    already shows. The hash of the last text of up to `cache_size` messages is kept.
+    """
+
+    def __init__(self, window: float = 0.5, cache_size: int = 1024):
+        self.window = window
+        self.cache_size = cache_size
+        self._bot: Optional[Bot] = None
+        self._pending: Dict[Key, Tuple[str, Optional[str]]] = {}  # key -> (text, parse_mode)
+        self._timers: Dict[Key, asyncio.TimerHandle] = {}
+        self._flushes: Set[asyncio.Task] = set()  # edits being sent, referenced until they are done
+        self._rendered: OrderedDict[Key, int] = OrderedDict()
+
+    def remember(self, chat_id: int, message_id: int, text: str):
+        """Record the text a message was sent with."""
+        key = (chat_id, message_id)
+        self._rendered[key] = hash(text)
+        self._rendered.move_to_end(key)
+        if len(self._rendered) > self.cache_size:
+            self._rendered.popitem(last=False)
+
+    def schedule(self, bot: Bot, chat_id: int, message_id: int, text: str, parse_mode: Optional[str] = None):
+        """Edit the message to `text` at the end of the window, replacing any edit still pending."""
+        self._bot = bot
+        key = (chat_id, message_id)
+        self._pending[key] = (text, parse_mode)
+        if key not in self._timers:
+            self._timers[key] = asyncio.get_running_loop().call_later(self.window, self._start_flush, key)
+
+    def cancel(self, chat_id: int, message_id: int):
+        """Drop the pending edit of a message, e.g. because it is going to be deleted."""
+        key = (chat_id, message_id)
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        self._pending.pop(key, None)
+        self._rendered.pop(key, None)
+
+    def _start_flush(self, key: Key):
+        del self._timers[key]
+        task = asyncio.get_running_loop().create_task(self._flush(key))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, key: Key):
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+        text, parse_mode = pending
+        if self._rendered.get(key) == hash(text):
+            log.debug(f"Message {key} unchanged, edit skipped")
+            return
+        chat_id, message_id = key
+        try:
+            await self._bot.edit_message_text(
+                chat_id=chat_id,
+                message_id=message_id,
+                text=text,
+                parse_mode=parse_mode,
+            )
+        except BadRequest as e:
+            if "not modified" not in str(e):
+                log.error(f"Error editing message {key}: {e}")
+                return
+        except TelegramError as e:
+            log.error(f"Error editing message {key}: {e}")
+            return
+        self.remember(chat_id, message_id, text)
+
+    async def close(self):
+        """Send the pending edits now and wait for the ones being sent, called when the bot stops."""
+        for timer in self._timers.values():
+            timer.cancel()
+        keys = list(self._timers)
+        self._timers.clear()
+        await asyncio.gather(
+            *(self._flush(key) for key in keys),
+            *self._flushes,
+            return_exceptions=True,
+        )
+
+
+edit_scheduler = EditScheduler()
@@ -0,0 +1,246 @@
+import time
+import heapq
+import asyncio
+import logging
+import functools
+import itertools
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import timedelta
+from enum import IntEnum
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Union
+
+from telegram.error import RetryAfter, TelegramError
+from telegram.ext import BaseRateLimiter
+
+log = logging.getLogger("ratelimit")
+
+
+class SendPriority(IntEnum):
+    # never 0: ExtBot ignores a falsy rate_limit_args
+    LOW = 1  # dumb trigger replies
+    NORMAL = 2  # commands, games
+    HIGH = 3  # todo chat
+
+
+_priority: ContextVar[SendPriority] = ContextVar("send_priority", default=SendPriority.NORMAL)
+
+
+def send_priority(priority: SendPriority):
+    """
+    Decorator to send every request made by a handler with the given priority.
+    Tasks created by the handler inherit it. An explicit rate_limit_args wins.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            token = _priority.set(priority)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                _priority.reset(token)
+        return wrapper
+    return decorator
+
+
+class StaleSendError(TelegramError):
+    """A low priority request waited too long and was dropped instead of sent late."""
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available."""
+        self._refill()
+        return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+    def consume(self):
+        self._refill()
+        self._tokens -= 1
+
+    @property
+    def full(self) -> bool:
+        self._refill()
+        return self._tokens >= self.capacity
+
+
+@dataclass(order=True)
+class _Waiter:
+    key: int  # negated priority, the heap pops the highest priority first
+    seq: int  # then first come first served
+    priority: SendPriority = field(compare=False)
+    enqueued: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+_sequence = itertools.count()
+
+
+class _SendQueue:
+    """Grants the requests waiting on one token bucket, highest priority first."""
+
+    def __init__(self, bucket: TokenBucket, max_low_wait: float):
+        self.bucket = bucket
+        self.max_low_wait = max_low_wait
+        self.dropped = 0
+        self._heap: List[_Waiter] = []
+        self._paused_until = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    @property
+    def idle(self) -> bool:
+        return not self._heap and time.monotonic() >= self._paused_until and self.bucket.full
+
+    def depth(self) -> Dict[str, int]:
+        counts = {priority.name: 0 for priority in SendPriority}
+        for waiter in self._heap:
+            if not waiter.future.done():
+                counts[waiter.priority.name] += 1
+        return counts
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _wait_time(self) -> float:
+        return max(self._paused_until - time.monotonic(), self.bucket.delay())
+
+    async def acquire(self, priority: SendPriority):
+        if not self._heap and self._wait_time() <= 0:
+            self.bucket.consume()
+            return
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(-priority, next(_sequence), priority, time.monotonic(), loop.create_future())
+        heapq.heappush(self._heap, waiter)
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._dispatch())
+        await waiter.future
+
+    async def _dispatch(self):
+        while self._heap:
+            wait = self._wait_time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            waiter = heapq.heappop(self._heap)
+            if waiter.future.done():
+                # the caller was cancelled
+                continue
+            waited = time.monotonic() - waiter.enqueued
+            if waiter.priority == SendPriority.LOW and waited > self.max_low_wait:
+                self.dropped += 1
+                waiter.future.set_exception(StaleSendError(f"Dropped after waiting {waited:.1f}s"))
+                continue
+            self.bucket.consume()
+            waiter.future.set_result(None)
+
+
+class PriorityRateLimiter(BaseRateLimiter[SendPriority]):
+    """
+    Keep the outgoing requests under the Telegram flood limits: a global bucket
+    for all of them, one bucket per group chat and one per private chat.
+    Waiting requests are sent highest priority first. The priority comes from
+    rate_limit_args, or from the send_priority decorator of the running handler.
+    A RetryAfter pauses the chat (the whole bot if the request has no chat)
+    and the request is retried. LOW requests that waited more than
+    max_low_wait seconds are dropped with a StaleSendError.
+    """
+
+    def __init__(
+        self,
+        overall_rate: float = 30,
+        group_rate: float = 20 / 60,
+        group_burst: float = 20,
+        private_rate: float = 1,
+        private_burst: float = 3,
+        max_low_wait: float = 10,
+        max_retries: int = 3,
+    ):
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.private_rate = private_rate
+        self.private_burst = private_burst
+        self.max_low_wait = max_low_wait
+        self.max_retries = max_retries
+        self.sent = 0
+        self.retried = 0
+        self._overall = _SendQueue(TokenBucket(overall_rate, overall_rate), max_low_wait)
+        self._chats: Dict[Union[int, str], _SendQueue] = {}
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        self._chats.clear()
+
+    def _chat_queue(self, chat_id: Union[int, str]) -> _SendQueue:
+        queue = self._chats.get(chat_id)
+        if queue is None:
+            if len(self._chats) > 1000:
+                self._chats = {key: value for key, value in self._chats.items() if not value.idle}
+            # group ids are negative, channels may be addressed by @username
+            if isinstance(chat_id, str) or chat_id < 0:
+                bucket = TokenBucket(self.group_rate, self.group_burst)
+            else:
+                bucket = TokenBucket(self.private_rate, self.private_burst)
+            queue = self._chats[chat_id] = _SendQueue(bucket, self.max_low_wait)
+        return queue
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depths per priority and counters since startup."""
+        chats_depth = {priority.name: 0 for priority in SendPriority}
+        for queue in self._chats.values():
+            for name, count in queue.depth().items():
+                chats_depth[name] += count
+        return {
+            "overall_queue": self._overall.depth(),
+            "chats_queue": chats_depth,
+            "sent": self.sent,
+            "retried": self.retried,
+            "dropped": self._overall.dropped + sum(queue.dropped for queue in self._chats.values()),
+        }
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, Dict[str, Any], List[Dict[str, Any]]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[SendPriority],
+    ) -> Union[bool, Dict[str, Any], List[Dict[str, Any]]]:
+        priority = rate_limit_args if rate_limit_args is not None else _priority.get()
+        chat_id = data.get("chat_id")
+        chat_queue = self._chat_queue(chat_id) if chat_id is not None else None
+
+        for attempt in itertools.count():
+            if chat_queue is not None:
+                await chat_queue.acquire(priority)
+            await self._overall.acquire(priority)
+            try:
+                result = await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt >= self.max_retries:
+                    raise
+                retry_after = e.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+                # not `chat_queue or ...`: a queue with no waiters is falsy
+                (chat_queue if chat_queue is not None else self._overall).pause(retry_after)
+                self.retried += 1
+                log.warning(f"{endpoint} to {chat_id} hit the flood limit, retrying in {retry_after}s")
+                continue
+            self.sent += 1
+            return result
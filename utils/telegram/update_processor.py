@@ -0,0 +1,72 @@
+import asyncio
+import logging
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Awaitable, Dict, List, Tuple
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+log = logging.getLogger("updates")
+
+Key = Tuple[str, int]
+
+# permits of the base class semaphore, see KeyedUpdateProcessor.__init__
+UNBOUNDED = 2**31 - 1
+
+
+class KeyedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Process up to max_concurrent_updates updates at the same time, while the
+    updates of the same chat or of the same user are still handled one after
+    the other, in the order they arrived.
+    """
+
+    def __init__(self, max_concurrent_updates: int = 64):
+        # process_update takes the base class semaphore before do_process_update:
+        # with the real bound there, a burst in one chat would take every permit
+        # while waiting on its lock. The bound is applied once the locks are held
+        if max_concurrent_updates < 1:
+            raise ValueError("`max_concurrent_updates` must be a positive integer!")
+        super().__init__(UNBOUNDED)
+        self._running = asyncio.Semaphore(max_concurrent_updates)
+        self._locks: Dict[Key, asyncio.Lock] = {}
+        self._holders: Dict[Key, int] = {}  # updates holding or waiting for each lock
+
+    @staticmethod
+    def _keys(update: object) -> List[Key]:
+        keys = []
+        if isinstance(update, Update):
+            if update.effective_chat:
+                keys.append(("chat", update.effective_chat.id))
+            if update.effective_user:
+                keys.append(("user", update.effective_user.id))
+        # always taken in the same order, so two updates can't wait on each other
+        return sorted(keys)
+
+    @asynccontextmanager
+    async def _hold(self, key: Key):
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+            self._holders[key] = 0
+        self._holders[key] += 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._holders[key] -= 1
+            if not self._holders[key]:
+                del self._locks[key], self._holders[key]
+
+    async def do_process_update(self, update: object, coroutine: Awaitable) -> None:
+        async with AsyncExitStack() as stack:
+            for key in self._keys(update):
+                await stack.enter_async_context(self._hold(key))
+            async with self._running:
+                await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
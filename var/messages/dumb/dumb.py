@@ -1,12 +1,11 @@
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional, Callable, Union
-import random
+from typing import List, Optional, Callable, Union
+import logging
 import os
-import requests
-import json
+import random
 
-unsplash_api_key = os.getenv("UNSPLASH_API_KEY")
+from utils.messages.dumb.unsplash import unsplash
 
 @dataclass
 class MediaInfo:
@@ -35,41 +34,50 @@ class MediaInfo:
     def file_location(self) -> Union[Path, int]:
         return self.resolve(self.FILE_LOCATION)
 
+log = logging.getLogger("dumb")
+
 # Resolve the current directory dynamically
 current_directory = Path(__file__).parent.absolute()
+# the folders of the images sent when no Unsplash image is ready, not part of the repo
+LOCAL_IMAGE_FOLDERS = ["eat", "ceo"]
 
 
 #helpers
-def get_unsplash_image_url(query: str = "random") -> Optional[str]:
+def random_local_image(folder: str) -> Optional[Path]:
     """
-    Fetches a random image URL from Unsplash using the specified query.
-    Returns the small size URL of the image.
+    Picks a random image from a local folder, used when no Unsplash image is ready.
+    Returns None if the folder is missing or empty.
     """
-    if not unsplash_api_key:
-        print("Unsplash API key is not set.")
-        return None
-    api_key = unsplash_api_key.strip()
-    # Build the URL
-    url = f"https://api.unsplash.com/photos/random?client_id={api_key}&query={query}"
-    
-    try:
-        # Make the request
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an exception for HTTP errors
-        
-        # Parse JSON response
-        data = response.json()
-        
-        # Extract the small URL
-        small_url = data['urls']['small']
-        return small_url
-        
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching image: {e}")
-        return None
-    except (KeyError, json.JSONDecodeError) as e:
-        print(f"Error parsing response: {e}")
-        return None
+    images = _local_images(folder)
+    return random.choice(images) if images else None
+
+def _local_images(folder: str) -> List[Path]:
+    # DUMB_IMAGES_DIR is read on every call, so it can point to a mounted folder
+    directory = Path(os.getenv("DUMB_IMAGES_DIR") or current_directory) / folder
+    return [path for path in directory.glob('*') if path.is_file()] if directory.is_dir() else []
+
+def check_local_images() -> List[str]:
+    """Warn about the local image folders that are missing or empty, returns their names."""
+    missing = [folder for folder in LOCAL_IMAGE_FOLDERS if not _local_images(folder)]
+    for folder in missing:
+        log.warning(
+            f"No local images in '{folder}', add some to {os.getenv('DUMB_IMAGES_DIR') or current_directory}/{folder} "
+            "or set DUMB_IMAGES_DIR: triggers get no image while the Unsplash buffer is empty"
+        )
+    return missing
+
+
+CEO_QUERIES = [
+    "sexy",
+    "foot fetish",
+    "feet fetish",
+    "sexy lady",
+    "sexy woman",
+    "beautiful woman",
+    "beautiful lady",
+]
+# prefetched by the unsplash provider when the bot starts
+UNSPLASH_QUERIES = ["food", *CEO_QUERIES]
 
 
 PREPUZIO = MediaInfo(
@@ -89,9 +97,8 @@ LETSGOSKY = MediaInfo(
 CARTOCCIATA = MediaInfo(
     MEDIA_TYPE="photo",
     # TG_FILE_ID="CgACAgQAAxkBAAEukSVnFlusdNveyGV9HLVQxa7JSl8qiQACPAMAAlfTBVOiKuLLaoHf-zYE",
-    TG_FILE_ID=lambda: get_unsplash_image_url("food"),
-    # FILE_LOCATION=lambda: random.choice(list((current_directory / 'eat').glob('*'))),
-    FILE_LOCATION=None,
+    TG_FILE_ID=lambda: unsplash.take("food"),
+    FILE_LOCATION=lambda: random_local_image('eat'),
     TEXT_MESSAGE=lambda: random.choice([
         "La cochina fresca fresca",
         "Ammuccamu",
@@ -115,16 +122,8 @@ RECORDED = MediaInfo(
 CEO = MediaInfo(
     MEDIA_TYPE="photo",
     # TG_FILE_ID="https://evek.uno/4432-large_default/test.jpg",
-    TG_FILE_ID=lambda: get_unsplash_image_url(random.choice([
-        "sexy",
-        "foot fetish",
-        "feet fetish",
-        "sexy lady",
-        "sexy woman",
-        "beautiful woman",
-        "beautiful lady",
-    ])),
-    FILE_LOCATION=None,
+    TG_FILE_ID=lambda: unsplash.take(random.choice(CEO_QUERIES)),
+    FILE_LOCATION=lambda: random_local_image('ceo'),
     TEXT_MESSAGE=lambda: random.choice([
         "mhhh 37 smalto bianco",
         "oouuughhh 💦",